@@ -9,12 +9,14 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 import threading
 from functools import wraps
+import itertools
 import json
 
 # Import shared resources
 from simpleLogger import SimpleLogger
 from cache_utils import redis_client
 from core import db, rate_limit, config
+from api.auth import invalidate_user_role
 
 # Initialize logger
 logger = SimpleLogger('admin')
@@ -368,6 +370,7 @@ def add_admin_user():
             INSERT INTO admin_users (username, added_by)
             VALUES (%s, %s)
         """, [username, current_user])
+        invalidate_user_role(username)
 
         logger.info(f"Added new admin user: {username} (by {current_user})")
         return jsonify({"message": "Admin user added successfully"}), 201
@@ -453,6 +456,7 @@ def remove_admin_user(username):
 
         if not result:
             return jsonify({"error": "Admin user not found"}), 404
+        invalidate_user_role(username)
 
         logger.info(f"Removed admin privileges from user: {username} (by {current_user})")
         return jsonify({"message": "Admin privileges removed successfully"}), 200
@@ -461,6 +465,32 @@ def remove_admin_user(username):
         logger.error(f"Error removing admin user: {e}")
         return jsonify({"error": "Failed to remove admin user"}), 500
 
+# Audit log filter conditions, in parameter order
+_AUDIT_LOG_FILTERS = (
+    ('username', "username = %s"),
+    ('action', "action = %s"),
+    ('days', "change_date >= NOW() - INTERVAL '%s days'"),
+)
+
+def _build_audit_log_query(active):
+    """Audit log SQL for one set of active filters"""
+    conditions = [sql for name, sql in _AUDIT_LOG_FILTERS if name in active]
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"""
+            SELECT id, action, username, changed_by, change_date
+            FROM admin_audit_log{where}
+            ORDER BY change_date DESC LIMIT %s
+        """
+
+# Audit log SQL for every combination of filters, built once at import
+_AUDIT_LOG_QUERIES = {
+    frozenset(active): _build_audit_log_query(active)
+    for active in itertools.chain.from_iterable(
+        itertools.combinations([name for name, _ in _AUDIT_LOG_FILTERS], n)
+        for n in range(len(_AUDIT_LOG_FILTERS) + 1)
+    )
+}
+
 @admin_bp.route('/api/v1/admin/audit', methods=['GET'])
 @admin_required()
 @rate_limit()
@@ -473,28 +503,20 @@ def get_admin_audit_log():
         days = request.args.get('days', type=int)
         limit = request.args.get('limit', 100, type=int)  # Default to 100 entries
 
-        # Build query
-        query = """
-            SELECT id, action, username, changed_by, change_date
-            FROM admin_audit_log
-            WHERE 1=1
-        """
+        # Collect active filters and pick the prebuilt query for them
+        active = []
         params = []
-
-        # Add filters if provided
         if username:
-            query += " AND username = %s"
+            active.append('username')
             params.append(username)
         if action:
-            query += " AND action = %s"
+            active.append('action')
             params.append(action.upper())  # Convert to uppercase to match DB
         if days:
-            query += " AND change_date >= NOW() - INTERVAL '%s days'"
+            active.append('days')
             params.append(days)
-
-        # Add order and limit
-        query += " ORDER BY change_date DESC LIMIT %s"
         params.append(limit)
+        query = _AUDIT_LOG_QUERIES[frozenset(active)]
 
         # Execute query
         rows = db(query, params)
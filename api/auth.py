@@ -5,7 +5,7 @@ PATH: api/auth.py
 from flask import Blueprint, jsonify, request, Response
 from flask_jwt_extended import (
     jwt_required, create_access_token,
-    create_refresh_token, get_jwt_identity, get_jwt
+    create_refresh_token, get_jwt_identity, get_jwt, decode_token
 )
 import ldap
 import bcrypt
@@ -36,6 +36,32 @@ def admin_required():
         return decorator
     return wrapper
 
+# Seconds a decoded token is reused; never past the token's own exp
+JWT_CACHE_TTL = 60
+JWT_CACHE_MAX = 10000
+
+# SHA-256 of token -> (reuse until, decoded claims)
+_jwt_cache = {}
+
+def decode_token_cached(token):
+    """decode_token, reusing the claims when the same token is seen again
+
+    For tokens presented outside the jwt_required() path, such as the log
+    tail WebSocket, where clients reconnect with the same token. Raises
+    like decode_token on an invalid or expired token, which is never cached.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    cached = _jwt_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    decoded = decode_token(token)
+    if len(_jwt_cache) >= JWT_CACHE_MAX:
+        _jwt_cache.clear()
+    _jwt_cache[key] = (min(decoded.get('exp', now), now + JWT_CACHE_TTL), decoded)
+    return decoded
+
 def ldap_authenticate(username, password):
     """Authenticate user against LDAP server"""
     logger.debug(f"Attempting LDAP authentication for user: {username}")
@@ -82,6 +108,21 @@ def ldap_authenticate(username, password):
 
     return False
 
+# LDAP user roles come from the admin_users table and rarely change, so
+# they are cached in Redis. Admin add/remove calls invalidate_user_role.
+ROLE_CACHE_TTL = 300
+
+def role_cache_key(username):
+    """Redis key holding the cached role of an LDAP user"""
+    return f"role:{username}"
+
+def invalidate_user_role(username):
+    """Drop a cached role after the user's admin status changes"""
+    try:
+        redis_client.delete(role_cache_key(username))
+    except Exception as e:
+        logger.error(f"Error invalidating cached role for {username}: {e}")
+
 def get_user_role(username):
     """Get user role from config or database"""
     try:
@@ -93,7 +134,7 @@ def get_user_role(username):
                     user_data = json.loads(user_json)
                     if username == user_data.get('username'):
                         role = user_data.get('role', 'user')
-                        logger.debug(f"Test user {username} assigned role: {role}")
+                        logger.debug("Test user", username, "assigned role:", role)
                         return role
                 except json.JSONDecodeError:
                     logger.error(f"Invalid JSON in TEST_USERS config")
@@ -106,18 +147,31 @@ def get_user_role(username):
                 user_data = json.loads(user_json)
                 if username == user_data.get('username'):
                     role = user_data.get('role', 'user')
-                    logger.debug(f"Local user {username} assigned role: {role}")
+                    logger.debug("Local user", username, "assigned role:", role)
                     return role
             except json.JSONDecodeError:
                 logger.error(f"Invalid JSON in LOCAL_USERS config for {local_username}")
                 continue
 
-        # If not a local user, check admin_users table for LDAP user role
+        # If not a local user, check the cache, then admin_users table for LDAP user role
+        cache_key = role_cache_key(username)
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                return cached.decode()
+        except Exception as e:
+            logger.error(f"Error reading cached role for {username}: {e}")
+
         result = db("SELECT EXISTS(SELECT 1 FROM admin_users WHERE username = %s)", (username,))
         is_admin = result[0][0] if result else False
 
         role = 'admin' if is_admin else 'user'
-        logger.debug(f"LDAP user {username} assigned role: {role}")
+        logger.debug("LDAP user", username, "assigned role:", role)
+
+        try:
+            redis_client.setex(cache_key, ROLE_CACHE_TTL, role)
+        except Exception as e:
+            logger.error(f"Error caching role for {username}: {e}")
         return role
 
     except Exception as e:
@@ -211,7 +265,7 @@ def update_user_activity(username):
                 VALUES (%s, %s, %s)
             """, (username, session_token, new_expires_at))
 
-        logger.debug(f"Updated session expiry for user: {username} (expires in {retention_days} days)")
+        logger.debug("Updated session expiry for user:", username, "(expires in", retention_days, "days)")
     except Exception as e:
         logger.error(f"Error updating user session: {e}")
 
@@ -323,7 +377,7 @@ def login():
                                 'session_token': session_token,
                                 'role': role
                             }
-                            logger.debug(f"Login response data: {response_data}")
+                            logger.debug("Login response data:", response_data)
                             return jsonify(response_data), 200
                     except json.JSONDecodeError:
                         logger.error(f"Invalid JSON in TEST_USERS config")
@@ -462,7 +516,7 @@ def get_user_sessions():
         jwt_claims = get_jwt()
         current_session = jwt_claims.get('session_token')
         role = jwt_claims.get('role', 'user')
-        logger.debug(f"User sessions request - username: {username}, role: {role}, session: {current_session}, claims: {jwt_claims}")
+        logger.debug("User sessions request - username:", username, "role:", role, "session:", current_session, "claims:", jwt_claims)
 
         # Get all sessions from the last 7 days
         # If admin, get all users' sessions, otherwise just the current user's
@@ -105,16 +105,17 @@ def get_health_summary():
         # Execute query
         results = db(query, params) if params else db(query)
 
-        # Get location-specific stats
+        # Get location-specific stats. Devices are counted per sensor first,
+        # so each sensor is one row and needs no DISTINCT to count.
         location_stats = db("""
             SELECT 
                 s.location,
-                COUNT(DISTINCT s.name) FILTER (WHERE s.status = 'Online') as sensors_online,
-                COUNT(DISTINCT s.name) FILTER (WHERE s.status = 'Offline') as sensors_offline,
-                COUNT(DISTINCT s.name) FILTER (WHERE s.status = 'Degraded') as sensors_degraded,
-                COUNT(d.*) FILTER (WHERE d.status = 'Online') as devices_online,
-                COUNT(d.*) FILTER (WHERE d.status = 'Offline') as devices_offline,
-                COUNT(d.*) FILTER (WHERE d.status = 'Degraded') as devices_degraded,
+                COUNT(*) FILTER (WHERE s.status = 'Online') as sensors_online,
+                COUNT(*) FILTER (WHERE s.status = 'Offline') as sensors_offline,
+                COUNT(*) FILTER (WHERE s.status = 'Degraded') as sensors_degraded,
+                COALESCE(SUM(d.online), 0)::integer as devices_online,
+                COALESCE(SUM(d.offline), 0)::integer as devices_offline,
+                COALESCE(SUM(d.degraded), 0)::integer as devices_degraded,
                 SUM(CASE WHEN s.pcap_avail IS NOT NULL THEN s.pcap_avail ELSE 0 END)::integer as pcap_minutes,
                 ROUND(AVG(CASE 
                     WHEN s.usedspace LIKE '%%\%%' 
@@ -122,7 +123,14 @@ def get_health_summary():
                     ELSE 0 
                 END))::integer as disk_usage
             FROM sensors s
-            LEFT JOIN devices d ON d.sensor = s.name
+            LEFT JOIN (
+                SELECT sensor,
+                    COUNT(*) FILTER (WHERE status = 'Online') as online,
+                    COUNT(*) FILTER (WHERE status = 'Offline') as offline,
+                    COUNT(*) FILTER (WHERE status = 'Degraded') as degraded
+                FROM devices
+                GROUP BY sensor
+            ) d ON d.sensor = s.name
             WHERE s.location IS NOT NULL
             GROUP BY s.location
         """)
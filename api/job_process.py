@@ -2,38 +2,112 @@
 Job process management for location-based PCAP jobs
 PATH: api/job_process.py
 """
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import Connection
 from typing import Dict, Optional
 from threading import Thread
 import threading
 from datetime import datetime
 import time
-import json
+import orjson
 import os
+import select
 import shutil
 from queue import Empty
+import queue as thread_queue
 
-from core import logger, db, config, JOBS_PATH, TASKS_PATH
+from core import logger, db, db_pool, config, STATUS, PATHS
 from simpleLogger import SimpleLogger
 from api.task_thread import start_task_thread, TASK_STATUS
 
+# Seconds a submit waits for a location's job process to take a job
+JOB_SEND_TIMEOUT = 5
+
+class JobPipe:
+    """Send side of a location's job handoff.
+
+    Jobs go to the job process as orjson bytes over a one-way Pipe, so a
+    put is one encode and one write: no pickling and no feeder thread as
+    with multiprocessing.Queue. Request threads share the pipe, so writes
+    are serialized by a lock. Datetimes arrive as ISO strings, which the
+    job process only binds into SQL.
+
+    A put never blocks a request thread indefinitely: it gives up when the
+    job process is dead, or when the lock or room in the pipe does not come
+    within the timeout. A job is far smaller than a pipe buffer page, so a
+    writable pipe takes it without blocking.
+    """
+    def __init__(self):
+        self.reader, self._writer = Pipe(duplex=False)
+        self._lock = threading.Lock()
+        self.proc: Optional[Process] = None
+
+    def put(self, job, timeout: float = JOB_SEND_TIMEOUT) -> bool:
+        """Send a job to the job process. Returns False if it was not sent."""
+        if self.proc is not None and not self.proc.is_alive():
+            return False
+
+        data = orjson.dumps(job)
+        deadline = time.monotonic() + timeout
+        if not self._lock.acquire(timeout=timeout):
+            return False
+        try:
+            _, writable, _ = select.select([], [self._writer], [], max(0, deadline - time.monotonic()))
+            if not writable:
+                return False
+            self._writer.send_bytes(data)
+            return True
+        except OSError:
+            # BrokenPipeError once the job process has exited
+            return False
+        finally:
+            self._lock.release()
+
 # Global dictionaries for job queues and processes
-job_queues: Dict[str, Queue] = {}
+job_queues: Dict[str, JobPipe] = {}
 job_procs: Dict[str, Process] = {}
 
 def start_job_proc(location: str) -> Process:
     """Start a new job process for a location"""
-    queue = Queue()
+    queue = JobPipe()
     job_queues[location] = queue
-    proc = Process(target=job_proc, args=(location, queue))
+    proc = Process(target=job_proc, args=(location, queue.reader))
     proc.start()
+    # Only the job process reads, so a send after it exits fails instead of
+    # filling a pipe nobody drains
+    queue.reader.close()
+    queue.proc = proc
     return proc
 
-def job_proc(location: str, queue: Queue) -> None:
+def _receive_jobs(reader: Connection, jobs: thread_queue.Queue) -> None:
+    """Move jobs from the pipe to the in-process queue as they arrive.
+
+    Keeps the pipe drained while a job runs, so senders never block on a
+    full pipe buffer.
+    """
+    while True:
+        try:
+            data = reader.recv_bytes()
+        except EOFError:
+            # Pipe closed
+            jobs.put('KILL')
+            return
+        jobs.put(orjson.loads(data))
+
+def job_proc(location: str, reader: Connection) -> None:
     """Main job process function that handles jobs for a location"""
     logger = SimpleLogger(f"job_proc_{location}")
     logger.info(f"Starting job processor for {location}")
 
+    # Under fork this process inherits the send end of every location's
+    # pipe, its own included. Close them so the reader sees EOF once the
+    # API side closes.
+    for pipe in job_queues.values():
+        pipe._writer.close()
+
+    queue = thread_queue.Queue()
+    Thread(target=_receive_jobs, args=(reader, queue), daemon=True).start()
+
     while True:
         try:
             # Wait for job from queue
@@ -42,51 +116,44 @@ def job_proc(location: str, queue: Queue) -> None:
                 logger.info(f"Shutting down job processor for {location}")
                 return
 
-            logger.info(f"Received job for location {location}: {job}")
+            logger.info("Received job for location", location, "from", job.get('submitted_by'))
+            logger.debug("Job parameters:", job)
 
-            # Create job record
-            job_id = create_job_record(job)
+            # Create job and task records in a single transaction
+            job_id, sensors = create_job_records(location, job)
             if not job_id:
                 logger.error("Failed to create job record")
                 continue
-
-            # Get sensors for location
-            sensors = get_location_sensors(location)
             if not sensors:
-                update_job_failed(job_id, "No sensors found for location")
-                continue
+                continue  # Recorded as failed, nothing to run
 
-            # Start task threads
-            task_queues = {}  # sensor_name -> Queue
+            # Start task threads. They all report on one in-process queue;
+            # every update carries its sensor name.
+            status_queue = thread_queue.Queue()
             task_threads = {} # sensor_name -> Thread
-            task_counter = 1  # Sequential task ID counter
-
-            for sensor in sensors:
-                # Create task record with sequential ID
-                task_filename = f"{TASKS_PATH}/{job_id}_{task_counter}.pcap"
-                task_id = create_task_record(job_id, task_counter, sensor['name'])
-                if not task_id:
-                    logger.error(f"Failed to create task record for {sensor['name']}")
-                    continue
 
-                # Start task thread
-                task_queue = Queue()
+            # Resolved once per job rather than once per sensor
+            task_pcap = PATHS.task_pcap
+
+            for task_counter, sensor in enumerate(sensors, start=1):
+                sensor_name = sensor['name']
+
+                # Start task thread. Each thread gets its own params dict,
+                # differing only in output_path.
                 thread = start_task_thread(
-                    sensor_name=sensor['name'],
+                    sensor_name=sensor_name,
                     sensor_fqdn=sensor['fqdn'],
                     job_id=job_id,
                     job_params={
                         **job,
-                        'output_path': task_filename
+                        'output_path': task_pcap.format(job_id, task_counter)
                     },
-                    status_queue=task_queue
+                    status_queue=status_queue
                 )
-                task_queues[sensor['name']] = task_queue
-                task_threads[sensor['name']] = thread
-                task_counter += 1
+                task_threads[sensor_name] = thread
 
             # Monitor tasks until completion
-            monitor_tasks(job_id, task_queues, task_threads)
+            monitor_tasks(job_id, status_queue, task_threads)
 
             # After tasks complete, handle merging
             merge_task_results(job_id)
@@ -101,50 +168,77 @@ def job_proc(location: str, queue: Queue) -> None:
             logger.error(f"Error in job processor: {e}")
             continue
 
-def get_location_sensors(location: str) -> list:
-    """Get list of active sensors for a location"""
-    try:
-        rows = db("""
-            SELECT name, fqdn 
-            FROM sensors 
-            WHERE location = %s 
-            AND status != 'Offline'
-            ORDER BY name
-        """, (location,))
-
-        return [{'name': row[0], 'fqdn': row[1]} for row in rows]
-    except Exception as e:
-        logger.error(f"Error getting sensors for location {location}: {e}")
-        return []
+def create_job_records(location: str, job: dict) -> tuple[Optional[int], list]:
+    """Look up the location's sensors and create the job and task records
 
-def create_job_record(job: dict) -> Optional[int]:
-    """Create a new job record in the database"""
+    Everything runs on one pooled connection and commits once, so a job is
+    never left without its tasks. A location with no active sensors still
+    gets a job record, created as Failed. Returns (job_id, sensors), with
+    sensors as a list of {'name', 'fqdn'} dicts.
+    """
+    conn = db_pool.getconn()
     try:
-        result = db("""
-            INSERT INTO jobs (
-                location, submitted_by, src_ip, dst_ip,
-                event_time, start_time, end_time, description,
-                status
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, 'Submitted'
-            ) RETURNING id
-        """, (
-            job['location'],
-            job['submitted_by'],
-            job['src_ip'],
-            job['dst_ip'],
-            job.get('event_time'),  # May be None
-            job['start_time'],
-            job['end_time'],
-            job['description']
-        ))
-        return result[0] if result else None
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT name, fqdn 
+                FROM sensors 
+                WHERE location = %s 
+                AND status != 'Offline'
+                ORDER BY name
+            """, (location,))
+            sensors = [{'name': row[0], 'fqdn': row[1]} for row in cur.fetchall()]
+
+            # Bind an explicit tuple in column order rather than copying the
+            # queued job dict just to add the two status columns
+            cur.execute("""
+                INSERT INTO jobs (
+                    location, submitted_by, src_ip, dst_ip,
+                    event_time, start_time, end_time, description,
+                    status, result_message
+                ) VALUES (
+                    %s, %s, %s, %s,
+                    %s, %s, %s, %s,
+                    %s, %s
+                ) RETURNING id
+            """, (
+                job['location'], job['submitted_by'], job['src_ip'], job['dst_ip'],
+                job['event_time'], job['start_time'], job['end_time'], job['description'],
+                'Submitted' if sensors else 'Failed',
+                None if sensors else "No sensors found for location"
+            ))
+            job_id = cur.fetchone()[0]
+
+            # One row per sensor, task IDs sequential from 1 in sensor order
+            if sensors:
+                cur.execute("""
+                    INSERT INTO tasks (
+                        job_id,
+                        task_id,
+                        sensor,
+                        status,
+                        pcap_size,
+                        temp_path,
+                        result_message,
+                        start_time,
+                        end_time,
+                        created_at
+                    )
+                    SELECT %s, s.task_id::integer, s.sensor, %s::task_status,
+                           NULL, NULL, NULL, NULL, NULL, NOW()
+                    FROM unnest(%s::text[]) WITH ORDINALITY AS s(sensor, task_id)
+                """, (job_id, TASK_STATUS['SUBMITTED'], [sensor['name'] for sensor in sensors]))
+
+        conn.commit()
+        return job_id, sensors
     except Exception as e:
-        logger.error(f"Error creating job record: {e}")
-        return None
+        conn.rollback()
+        logger.error(f"Error creating job records for {location}: {e}")
+        return None, []
+    finally:
+        db_pool.putconn(conn)
 
 def update_job_failed(job_id: int, message: str):
-    """Update job status to failed with message"""
+    """Update job status to failed with message, unless it was cancelled"""
     try:
         db("""
             UPDATE jobs 
@@ -152,85 +246,83 @@ def update_job_failed(job_id: int, message: str):
                 result_message = %s,
                 end_time = NOW()
             WHERE id = %s
-        """, (message, job_id))
+            AND status != %s
+        """, (message, job_id, STATUS['Cancelled']))
     except Exception as e:
         logger.error(f"Error updating job {job_id} status: {e}")
 
-def monitor_tasks(job_id: int, task_queues: Dict[str, Queue], task_threads: Dict[str, Thread]) -> None:
-    """Monitor task threads until completion and update job status"""
+def monitor_tasks(job_id: int, status_queue: thread_queue.Queue, task_threads: Dict[str, Thread]) -> None:
+    """Monitor task threads until completion and update job status
+
+    All task threads of the job share status_queue, so the monitor blocks on
+    a single queue instead of polling one queue per sensor.
+    """
     try:
         completed_tasks = set()
         last_update_time = {name: time.time() for name in task_threads.keys()}
         QUEUE_TIMEOUT = 1.0  # 1 second timeout per queue check
         TASK_TIMEOUT = 1800  # 30 minutes before considering a task dead
+        FINAL_STATUSES = (TASK_STATUS['COMPLETE'], TASK_STATUS['FAILED'], TASK_STATUS['SKIPPED'])
+
+        # Task record IDs by sensor, looked up once for the whole job
+        task_ids = {sensor: task_id for task_id, sensor in db(
+            "SELECT id, sensor FROM tasks WHERE job_id = %s", (job_id,))}
 
         while len(completed_tasks) < len(task_threads):
+            changed = False
+
+            try:
+                status_update = status_queue.get(timeout=QUEUE_TIMEOUT)
+            except Empty:
+                status_update = None
+
             current_time = time.time()
 
-            # Check each task that hasn't completed
-            for sensor_name, queue in task_queues.items():
-                if sensor_name in completed_tasks:
-                    continue
+            if status_update:
+                sensor_name = status_update['sensor']
+                last_update_time[sensor_name] = current_time
 
-                thread = task_threads[sensor_name]
+                # Update task status in DB
+                update_task_status(task_ids[sensor_name], status_update['status'], status_update.get('result'))
+                changed = True
 
-                # Get task record ID
-                task_row = db("SELECT id FROM tasks WHERE job_id = %s AND sensor = %s", 
-                            (job_id, sensor_name))
-                if not task_row:
-                    logger.error(f"No task record found for {sensor_name}")
-                    continue
+                # If task is in final state
+                if status_update['status'] in FINAL_STATUSES:
+                    completed_tasks.add(sensor_name)
 
-                task_id = task_row[0]
+            # Check each task that hasn't completed
+            for sensor_name, thread in task_threads.items():
+                if sensor_name in completed_tasks:
+                    continue
 
-                # Check if thread died
+                # A finished thread has already queued all of its updates, so
+                # it only died unexpectedly if none of them are still pending
                 if not thread.is_alive():
+                    if not status_queue.empty():
+                        continue
                     logger.error(f"Task thread for {sensor_name} died unexpectedly")
-                    if sensor_name not in completed_tasks:
-                        update_task_status(task_id, TASK_STATUS['FAILED'], 
-                                        {'message': 'Task thread died unexpectedly'})
-                        completed_tasks.add(sensor_name)
+                    update_task_status(task_ids[sensor_name], TASK_STATUS['FAILED'],
+                                    {'message': 'Task thread died unexpectedly'})
+                    completed_tasks.add(sensor_name)
+                    changed = True
                     continue
 
                 # Check for task timeout
-                if (current_time - last_update_time[sensor_name] > TASK_TIMEOUT and 
-                    sensor_name not in completed_tasks):
+                if current_time - last_update_time[sensor_name] > TASK_TIMEOUT:
                     logger.error(f"Task {sensor_name} timed out - no updates in {TASK_TIMEOUT} seconds")
-                    update_task_status(task_id, TASK_STATUS['FAILED'],
+                    update_task_status(task_ids[sensor_name], TASK_STATUS['FAILED'],
                                     {'message': f'Task timed out after {TASK_TIMEOUT/60:.0f} minutes'})
                     completed_tasks.add(sensor_name)
+                    changed = True
 
                     # Kill the timed out thread
                     if thread.is_alive():
                         logger.warning(f"Killing timed out task thread for {sensor_name}")
                         thread._stop()
-                    continue
-
-                try:
-                    # Check queue with timeout
-                    status_update = queue.get(timeout=QUEUE_TIMEOUT)
-                    last_update_time[sensor_name] = current_time
-
-                    # Update task status in DB
-                    update_task_status(task_id, status_update['status'], status_update.get('result'))
-
-                    # If task is in final state
-                    if status_update['status'] in [
-                        TASK_STATUS['COMPLETE'], 
-                        TASK_STATUS['FAILED'], 
-                        TASK_STATUS['SKIPPED']
-                    ]:
-                        completed_tasks.add(sensor_name)
-
-                except Empty:
-                    # No update from this queue, continue to next
-                    continue
 
             # Update job status based on task states
-            update_job_status_from_tasks(job_id)
-
-            # Small sleep between queue check cycles
-            time.sleep(0.1)
+            if changed:
+                update_job_status_from_tasks(job_id)
 
         # All tasks have reported completion
         cleanup_tasks(task_threads)
@@ -239,32 +331,13 @@ def monitor_tasks(job_id: int, task_queues: Dict[str, Queue], task_threads: Dict
         logger.error(f"Error monitoring tasks: {e}")
         update_job_failed(job_id, f"Error monitoring tasks: {e}")
 
-def create_task_record(job_id: int, task_id: int, sensor_name: str) -> Optional[int]:
-    """Create task record in database"""
-    try:
-        result = db("""
-            INSERT INTO tasks (
-                job_id,
-                task_id,
-                sensor,
-                status,
-                pcap_size,
-                temp_path,
-                result_message,
-                start_time,
-                end_time,
-                created_at
-            ) VALUES (
-                %s, %s, %s, %s::task_status, NULL, NULL, NULL, NULL, NULL, NOW()
-            ) RETURNING id
-        """, (job_id, task_id, sensor_name, TASK_STATUS['SUBMITTED']))
-        return result[0] if result else None
-    except Exception as e:
-        logger.error(f"Error creating task record: {e}")
-        return None
-
 def update_task_status(task_id: int, status: str, result: dict = None) -> None:
-    """Update task status in database"""
+    """Update task status in database
+
+    Every update skips a task that is already Aborted, so a late report
+    from its thread never revives a task that cancel_job aborted.
+    """
+    aborted = TASK_STATUS['ABORTED']
     try:
         if status == TASK_STATUS['RUNNING']:
             db("""
@@ -272,7 +345,8 @@ def update_task_status(task_id: int, status: str, result: dict = None) -> None:
                 SET status = %s,
                     started_at = NOW()
                 WHERE id = %s
-            """, (status, task_id))
+                AND status != %s
+            """, (status, task_id, aborted))
 
         elif status == TASK_STATUS['RETRIEVING']:
             # Use temp_path from result if provided
@@ -282,7 +356,8 @@ def update_task_status(task_id: int, status: str, result: dict = None) -> None:
                 SET status = %s,
                     temp_path = %s
                 WHERE id = %s
-            """, (status, temp_path, task_id))
+                AND status != %s
+            """, (status, temp_path, task_id, aborted))
 
         elif status in [TASK_STATUS['COMPLETE'], TASK_STATUS['FAILED'], TASK_STATUS['SKIPPED']]:
             db("""
@@ -292,11 +367,13 @@ def update_task_status(task_id: int, status: str, result: dict = None) -> None:
                     pcap_size = %s,
                     result_message = %s
                 WHERE id = %s
+                AND status != %s
             """, (
                 status,
                 result.get('file_size', '0') if status == TASK_STATUS['COMPLETE'] else None,
-                json.dumps(result) if result else None,
-                task_id
+                orjson.dumps(result).decode() if result else None,
+                task_id,
+                aborted
             ))
         else:
             db("""
@@ -304,13 +381,18 @@ def update_task_status(task_id: int, status: str, result: dict = None) -> None:
                 SET status = %s,
                     result_message = %s
                 WHERE id = %s
-            """, (status, json.dumps(result) if result else None, task_id))
+                AND status != %s
+            """, (status, orjson.dumps(result).decode() if result else None, task_id, aborted))
 
     except Exception as e:
         logger.error(f"Error updating task status: {e}")
 
 def update_job_status_from_tasks(job_id: int) -> None:
-    """Update job status based on current task states in DB"""
+    """Update job status based on current task states in DB
+
+    The UPDATE itself skips a job that is merging or was cancelled, so a
+    cancel landing while the status is worked out is never overwritten.
+    """
     try:
         # Get all task statuses for this job
         rows = db("""
@@ -323,18 +405,6 @@ def update_job_status_from_tasks(job_id: int) -> None:
         status_counts = {row[0]: row[1] for row in rows}
         total_tasks = sum(status_counts.values())
 
-        # Get current job status
-        job_row = db("SELECT status FROM jobs WHERE id = %s", (job_id,))
-        if not job_row:
-            logger.error(f"No job record found for ID {job_id}")
-            return
-
-        current_status = job_row[0]
-
-        # Don't update if job is in Merging state
-        if current_status == 'Merging':
-            return
-
         # Determine job status
         running_count = status_counts.get(TASK_STATUS['RUNNING'], 0)
         retrieving_count = status_counts.get(TASK_STATUS['RETRIEVING'], 0)
@@ -374,7 +444,8 @@ def update_job_status_from_tasks(job_id: int) -> None:
                     ELSE NULL
                 END
             WHERE id = %s
-        """, (status, message, status, status, job_id))
+            AND status NOT IN ('Merging', %s)
+        """, (status, message, status, status, job_id, STATUS['Cancelled']))
 
     except Exception as e:
         logger.error(f"Error updating job {job_id} status: {e}")
@@ -391,14 +462,19 @@ def cleanup_tasks(task_threads: Dict[str, threading.Thread]) -> None:
 def merge_task_results(job_id: int) -> None:
     """Merge task results for a job"""
     try:
-        # Update job to merging state
-        db("""
+        # Update job to merging state unless it was cancelled meanwhile
+        merging = db("""
             UPDATE jobs 
             SET status = 'Merging',
                 result_message = 'Merging task results',
                 updated_at = NOW()
             WHERE id = %s
-        """, (job_id,))
+            AND status != %s
+            RETURNING id
+        """, (job_id, STATUS['Cancelled']))
+        if not merging:
+            logger.info(f"Job {job_id} was cancelled, skipping merge")
+            return
 
         # Get completed tasks with data
         tasks = db("""
@@ -423,7 +499,7 @@ def merge_task_results(job_id: int) -> None:
             return
 
         # Set up final output path
-        output_path = f"{JOBS_PATH}/{job_id}.pcap"
+        output_path = PATHS.job_pcap.format(job_id)
 
         if len(tasks) == 1:
             # Single file, just copy
@@ -467,4 +543,5 @@ def merge_task_results(job_id: int) -> None:
                 updated_at = NOW(),
                 completed_at = NOW()
             WHERE id = %s
-        """, (f"Error merging results: {str(e)}", job_id))
+            AND status != %s
+        """, (f"Error merging results: {str(e)}", job_id, STATUS['Cancelled']))
@@ -2,77 +2,275 @@
 Job submission and management endpoints
 PATH: api/jobs.py
 """
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt
-import json
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from pathlib import Path
+from queue import Queue
+from threading import Thread
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Optional
+from functools import lru_cache
+from psycopg2.extras import RealDictCursor
+import msgspec
 
-from core import logger, db, config, rate_limit
+from core import logger, db, db_prepared, db_stream_started, request_conn, config, rate_limit, json_response, json_stream_response, STATUS
 from api.auth import activity_tracking
 from api.location_manager import location_manager
+from api.task_thread import TASK_STATUS
 
 jobs_bp = Blueprint('jobs', __name__)
 
-def validate_job_params(data: dict) -> tuple[Optional[dict], Optional[List[str]]]:
-    """Validate job parameters and return processed job dict or error list"""
-    try:
-        # Required fields
-        location = data.get('location')
-        if not location: return None, ['missing:location']
-
-        params = data.get('params', {})
-        if not params: return None, ['missing:params']
-
-        # Build job dictionary
-        job = {
-            'location': location,
-            'submitted_by': get_jwt().get('sub', 'unknown'),
-            'src_ip': params.get('src_ip'),
-            'dst_ip': params.get('dst_ip'),
-            'event_time': params.get('event_time'),
-            'start_time': params.get('start_time'),
-            'end_time': params.get('end_time'),
-            'description': params.get('description'),
-            'tz': params.get('tz', '+00:00')
-        }
+def _iso_utc_expr(column: str) -> str:
+    """SQL expression rendering a timestamptz column as ISO-8601 UTC text"""
+    return f"""to_char({column} AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"')"""
+
+def _iso_utc(column: str) -> str:
+    """_iso_utc_expr as a select-list column named after the source column"""
+    return f"{_iso_utc_expr(column)} AS {column.split('.')[-1]}"
+
+# Search window around an event_time when start/end are not given
+EVENT_START_BEFORE = timedelta(minutes=config.getint('EVENT', 'start_before', fallback=1))
+EVENT_END_AFTER = timedelta(minutes=config.getint('EVENT', 'end_after', fallback=4))
+
+# Job summary columns shared by the status and per-location queries.
+# Timestamps arrive as ready-to-send strings (NULL stays None), and the
+# column names match the response keys so dict rows can be sent as-is.
+# Tasks are summarized as {status: count}, so a job's row stays the same
+# size however many sensors it ran on.
+JOB_SUMMARY_COLUMNS = f"""
+    j.id, j.location, j.submitted_by, j.src_ip, j.dst_ip,
+    {_iso_utc('j.event_time')},
+    {_iso_utc('j.start_time')},
+    {_iso_utc('j.end_time')},
+    j.description, j.status, j.result_message,
+    COALESCE(tc.counts, '{{}}'::json) AS task_status_counts
+"""
 
-        # Validate required combinations
-        errors = []
+# Per-job task status counts for JOB_SUMMARY_COLUMNS, read from
+# idx_tasks_job_id_status
+JOB_SUMMARY_FROM = """
+    FROM jobs j
+    LEFT JOIN LATERAL (
+        SELECT json_object_agg(status, n) AS counts
+        FROM (
+            SELECT status, count(*) AS n
+            FROM tasks
+            WHERE job_id = j.id
+            GROUP BY status
+        ) s
+    ) tc ON true
+"""
 
-        if not (job['src_ip'] or job['dst_ip']):
-            errors.append('must include src_ip, dst_ip, or both')
+# All jobs with their tasks. Each row is one JSON object assembled by
+# Postgres and cast to text, so it is streamed without any per-column work
+# in Python. json_build_object keeps the key order given here.
+_ALL_JOBS_SELECT = f"""
+    SELECT json_build_object(
+        'id', j.id,
+        'location', j.location,
+        'submitted_by', j.submitted_by,
+        'src_ip', host(j.src_ip),
+        'dst_ip', host(j.dst_ip),
+        'event_time', {_iso_utc_expr('j.event_time')},
+        'start_time', {_iso_utc_expr('j.start_time')},
+        'end_time', {_iso_utc_expr('j.end_time')},
+        'description', j.description,
+        'status', j.status,
+        'result_message', j.result_message,
+        'result_size', j.result_size,
+        'result_path', j.result_path,
+        'created_at', {_iso_utc_expr('j.created_at')},
+        'started_at', {_iso_utc_expr('j.started_at')},
+        'completed_at', {_iso_utc_expr('j.completed_at')},
+        'tasks', COALESCE(json_agg(json_build_object(
+            'id', t.id,
+            'job_id', t.job_id,
+            'task_id', t.task_id,
+            'sensor', t.sensor,
+            'status', t.status,
+            'pcap_size', t.pcap_size,
+            'temp_path', t.temp_path,
+            'result_message', t.result_message,
+            'start_time', {_iso_utc_expr('t.start_time')},
+            'end_time', {_iso_utc_expr('t.end_time')},
+            'created_at', {_iso_utc_expr('t.created_at')},
+            'started_at', {_iso_utc_expr('t.started_at')},
+            'completed_at', {_iso_utc_expr('t.completed_at')}
+        )) FILTER (WHERE t.id IS NOT NULL), '[]'::json)
+    )::text
+    FROM jobs j
+    LEFT JOIN tasks t ON t.job_id = j.id
+"""
 
-        # Handle event time calculations
-        if job['event_time']:
-            event_time = datetime.fromisoformat(job['event_time'].replace('Z', '+00:00'))
+# get_all_jobs pages keyed by (username filter set, before_id cursor set).
+# Built once so requests never assemble SQL strings.
+_ALL_JOBS_PAGE = """
+    GROUP BY j.id
+    ORDER BY j.id DESC
+    LIMIT %s
+"""
+_ALL_JOBS_QUERIES = {
+    (False, False): _ALL_JOBS_SELECT + _ALL_JOBS_PAGE,
+    (True, False): _ALL_JOBS_SELECT + "    WHERE j.submitted_by = %s" + _ALL_JOBS_PAGE,
+    (False, True): _ALL_JOBS_SELECT + "    WHERE j.id < %s" + _ALL_JOBS_PAGE,
+    (True, True): _ALL_JOBS_SELECT + "    WHERE j.submitted_by = %s AND j.id < %s" + _ALL_JOBS_PAGE,
+}
+
+# Single job summary for get_job_status, run as a prepared statement
+_JOB_STATUS_QUERY = f"""
+    SELECT {JOB_SUMMARY_COLUMNS}
+    {JOB_SUMMARY_FROM}
+    WHERE j.id = $1
+"""
 
-            if not job['start_time']:
-                offset = config.getint('EVENT', 'start_before', fallback=1)
-                job['start_time'] = (event_time - timedelta(minutes=offset)).isoformat()
+# Per-location job pages, newest first, keyed by whether a before_id
+# cursor is set. Each page is a range scan of idx_jobs_location_id.
+_LOCATION_JOBS_SELECT = f"""
+    SELECT {JOB_SUMMARY_COLUMNS}
+    {JOB_SUMMARY_FROM}
+    WHERE j.location = %s
+"""
+_LOCATION_JOBS_PAGE = """
+    ORDER BY j.id DESC
+    LIMIT %s
+"""
+_LOCATION_JOBS_QUERIES = {
+    False: _LOCATION_JOBS_SELECT + _LOCATION_JOBS_PAGE,
+    True: _LOCATION_JOBS_SELECT + "    AND j.id < %s" + _LOCATION_JOBS_PAGE,
+}
+
+# Page size bounds for job listings. The all-jobs listing carries every
+# task of every job, so its default page is smaller.
+JOBS_PAGE_DEFAULT = 250
+ALL_JOBS_PAGE_DEFAULT = 100
+JOBS_PAGE_MAX = 1000
+
+# Job statuses that are finished and may be deleted
+FINISHED_STATUSES = ('Complete', 'Partial Complete', 'Failed', 'Aborted', STATUS['Cancelled'])
+
+# Job statuses that can still be cancelled
+ACTIVE_STATUSES = ('Submitted', 'Running')
+
+# Task statuses aborted when their job is cancelled
+ACTIVE_TASK_STATUSES = (TASK_STATUS['SUBMITTED'], TASK_STATUS['RUNNING'], TASK_STATUS['RETRIEVING'])
+
+# Result files are removed by a background thread so slow storage never
+# holds up a request worker. Each queue item is a list of file paths.
+_file_gc_queue: Queue = Queue()
+
+def _file_gc_worker():
+    """Remove files queued by request handlers"""
+    while True:
+        paths = _file_gc_queue.get()
+        for path in paths:
+            try:
+                # One unlink syscall; a file already gone is not an error
+                Path(path).unlink(missing_ok=True)
+                logger.debug("Removed job file", path)
+            except Exception as e:
+                logger.error(f"Error removing job file {path}: {e}")
+
+Thread(target=_file_gc_worker, name="job_file_gc", daemon=True).start()
+
+class JobParams(msgspec.Struct, omit_defaults=True):
+    """Search parameters of a job submission"""
+    src_ip: Optional[str] = None
+    dst_ip: Optional[str] = None
+    event_time: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    description: Optional[str] = None
+    tz: str = '+00:00'
+
+class SubmitJobRequest(msgspec.Struct, omit_defaults=True):
+    """Job submission body. Missing fields are reported by validate_job_params"""
+    location: str = ''
+    params: Optional[JobParams] = None
+
+# What "params": {} decodes to, rejected like missing params
+_EMPTY_JOB_PARAMS = JobParams()
+
+# Decodes and type-checks a submission body in a single pass
+_submit_job_decoder = msgspec.json.Decoder(SubmitJobRequest)
+
+@lru_cache(maxsize=1024)
+def _parse_event_time(value: str) -> datetime:
+    """Parse an ISO-8601 event time; batch submissions often repeat one"""
+    # Only a trailing Z needs rewriting for fromisoformat; other inputs are
+    # parsed without building a new string
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+def validate_job_params(data: SubmitJobRequest, submitted_by: str) -> tuple[Optional[dict], Optional[List[str]]]:
+    """Validate job parameters and return processed job dict or error list
+
+    Depends only on its arguments; the caller supplies the submitting user.
+    The body has already been type-checked by msgspec, so the only call
+    here that can raise is the event time parse, which is guarded on its own.
+    """
+    # Required fields
+    location = data.location
+    if not location: return None, ['missing:location']
+
+    params = data.params
+    if params is None or params == _EMPTY_JOB_PARAMS: return None, ['missing:params']
+
+    # Build job dictionary
+    job = {
+        'location': location,
+        'submitted_by': submitted_by,
+        'src_ip': params.src_ip,
+        'dst_ip': params.dst_ip,
+        'event_time': params.event_time,
+        'start_time': params.start_time,
+        'end_time': params.end_time,
+        'description': params.description,
+        'tz': params.tz
+    }
 
-            if not job['end_time']:
-                offset = config.getint('EVENT', 'end_after', fallback=4)
-                job['end_time'] = (event_time + timedelta(minutes=offset)).isoformat()
+    # Validate required combinations. The error list is only created
+    # once something fails, so valid submissions never allocate it.
+    errors = None
+
+    if not (job['src_ip'] or job['dst_ip']):
+        errors = ['must include src_ip, dst_ip, or both']
+
+    # Handle event time calculations. The parsed event time is kept as a
+    # datetime, and derived window bounds stay datetimes too: psycopg2
+    # binds them directly, so they are never rendered back to text for
+    # Postgres to parse again.
+    if job['event_time']:
+        try:
+            event_time = _parse_event_time(job['event_time'])
+        except ValueError:
+            errors = errors or []
+            errors.append('invalid:event_time')
+            return None, errors
+        job['event_time'] = event_time
 
-        # Final time validation
         if not job['start_time']:
-            errors.append('missing:start_time')
+            job['start_time'] = event_time - EVENT_START_BEFORE
+
         if not job['end_time']:
-            errors.append('missing:end_time')
+            job['end_time'] = event_time + EVENT_END_AFTER
 
-        if errors:
-            return None, errors
+    # Final time validation
+    if not job['start_time']:
+        errors = errors or []
+        errors.append('missing:start_time')
+    if not job['end_time']:
+        errors = errors or []
+        errors.append('missing:end_time')
 
-        # Set default description if none provided
-        if not job['description']:
-            job['description'] = f"src:{job['src_ip']}->dst:{job['dst_ip']}"
+    if errors:
+        return None, errors
 
-        return job, None
+    # Set default description if none provided
+    if not job['description']:
+        job['description'] = f"src:{job['src_ip']}->dst:{job['dst_ip']}"
 
-    except Exception as e:
-        logger.error(f"Error validating job params: {e}")
-        return None, ['Invalid job parameters']
+    return job, None
 
 @jobs_bp.route('/api/v1/jobs/submit', methods=['POST'])
 @jwt_required()
@@ -95,12 +293,19 @@ def submit_job():
     }
     """
     try:
-        data = request.get_json()
-        if not data: return jsonify({"error": "No JSON data provided"}), 400
+        body = request.get_data()
+        if not body: return json_response({"error": "No JSON data provided"}), 400
+
+        try:
+            data = _submit_job_decoder.decode(body)
+        except msgspec.ValidationError as e:
+            return json_response({"errors": [str(e)]}), 400
+        except msgspec.DecodeError:
+            return json_response({"error": "Invalid JSON data"}), 400
 
         # Validate and process parameters
-        job, errors = validate_job_params(data)
-        if errors: return jsonify({"errors": errors}), 400
+        job, errors = validate_job_params(data, get_jwt_identity() or 'unknown')
+        if errors: return json_response({"errors": errors}), 400
 
         location = job['location']
 
@@ -108,12 +313,14 @@ def submit_job():
         queue, error = location_manager.get_location_queue(location)
 
         if not queue:
-            return jsonify({"error": error}), 400
+            return json_response({"error": error}), 400
 
         # Queue the job
-        queue.put(job)
+        if not queue.put(job):
+            logger.error(f"Job processor for {location} did not accept the job")
+            return json_response({"error": f"Job processor for {location} is not accepting jobs"}), 503
 
-        return jsonify({
+        return json_response({
             "message": "Job submitted successfully",
             "location": location,
             "params": job
@@ -121,7 +328,7 @@ def submit_job():
 
     except Exception as e:
         logger.error(f"Error submitting job: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 @jobs_bp.route('/api/v1/jobs/<int:job_id>/status', methods=['GET'])
 @jwt_required()
@@ -130,162 +337,218 @@ def get_job_status(job_id):
     """Get status of a specific job"""
     try:
         # Get job details
-        job = db("""
-            SELECT j.id, j.location, j.submitted_by, j.src_ip, j.dst_ip,
-                   j.event_time, j.start_time, j.end_time, j.description,
-                   j.status, j.result_message,
-                   array_agg(t.status) as task_statuses
-            FROM jobs j
-            LEFT JOIN tasks t ON t.job_id = j.id
-            WHERE j.id = %s
-            GROUP BY j.id
-        """, (job_id,))
+        job = db_prepared('job_status', _JOB_STATUS_QUERY, (job_id,), cursor_factory=RealDictCursor)
 
         if not job:
-            return jsonify({"error": "Job not found"}), 404
-
-        job = job[0]
-
-        # Format response
-        response = {
-            'id': job[0],
-            'location': job[1],
-            'submitted_by': job[2],
-            'src_ip': job[3],
-            'dst_ip': job[4],
-            'event_time': job[5].isoformat() if job[5] else None,
-            'start_time': job[6].isoformat() if job[6] else None,
-            'end_time': job[7].isoformat() if job[7] else None,
-            'description': job[8],
-            'status': job[9],
-            'result_message': job[10],
-            'task_statuses': job[11] if job[11] and job[11][0] is not None else []
-        }
+            return json_response({"error": "Job not found"}), 404
 
-        return jsonify(response), 200
+        # The dict row is keyed by column alias and already formatted
+        return json_response(job[0]), 200
 
     except Exception as e:
         logger.error(f"Error getting job status: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 @jobs_bp.route('/api/v1/jobs/<string:location>', methods=['GET'])
 @jwt_required()
 @rate_limit()
 def get_jobs_by_location(location):
-    """Get all jobs for a specific location"""
+    """Get a page of jobs for a specific location, newest first.
+
+    Query params:
+        limit: page size (default 250, max 1000)
+        before_id: only return jobs with a lower id; pass the last id of the
+                   previous page to fetch the next one
+    """
     try:
-        # Get jobs for location
-        jobs = db("""
-            SELECT j.id, j.location, j.submitted_by, j.src_ip, j.dst_ip,
-                   j.event_time, j.start_time, j.end_time, j.description,
-                   j.status, j.result_message,
-                   array_agg(t.status) as task_statuses
-            FROM jobs j
-            LEFT JOIN tasks t ON t.job_id = j.id
-            WHERE j.location = %s
-            GROUP BY j.id
-            ORDER BY j.id DESC
-        """, (location,))
-
-        # Format response
-        response = []
-        for job in jobs:
-            response.append({
-                'id': job[0],
-                'location': job[1],
-                'submitted_by': job[2],
-                'src_ip': job[3],
-                'dst_ip': job[4],
-                'event_time': job[5].isoformat() if job[5] else None,
-                'start_time': job[6].isoformat() if job[6] else None,
-                'end_time': job[7].isoformat() if job[7] else None,
-                'description': job[8],
-                'status': job[9],
-                'result_message': job[10],
-                'task_statuses': job[11] if job[11] and job[11][0] is not None else []
-            })
-
-        return jsonify({'jobs': response}), 200
+        limit = min(max(request.args.get('limit', JOBS_PAGE_DEFAULT, type=int), 1), JOBS_PAGE_MAX)
+        before_id = request.args.get('before_id', type=int)
+
+        if before_id is None:
+            params = (location, limit)
+        else:
+            params = (location, before_id, limit)
+        query = _LOCATION_JOBS_QUERIES[before_id is not None]
+
+        # Stream rows from a server-side cursor straight into the response.
+        # The first row is fetched here, so database errors still get a 500
+        # before the stream starts.
+        jobs = db_stream_started(query, params, cursor_factory=RealDictCursor)
+
+        return json_stream_response('jobs', jobs), 200
 
     except Exception as e:
         logger.error(f"Error getting jobs for location {location}: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 @jobs_bp.route('/api/v1/jobs', methods=['GET'])
 @jwt_required()
 @rate_limit()
 def get_all_jobs():
-    """Get all jobs with their associated tasks"""
+    """Get a page of jobs with their associated tasks, newest first.
+
+    Query params:
+        username: only jobs submitted by this user
+        limit: page size (default 100, max 1000)
+        before_id: only return jobs with a lower id; pass the last id of the
+                   previous page to fetch the next one
+    """
     try:
-        # Get username from query params
         username = request.args.get('username')
+        limit = min(max(request.args.get('limit', ALL_JOBS_PAGE_DEFAULT, type=int), 1), JOBS_PAGE_MAX)
+        before_id = request.args.get('before_id', type=int)
 
-        # Build base query
-        query = """
-            SELECT 
-                j.id, j.location, j.submitted_by, j.src_ip, j.dst_ip,
-                j.event_time, j.start_time, j.end_time, j.description,
-                j.status, j.result_message, j.result_size, j.result_path,
-                j.created_at, j.started_at, j.completed_at,
-                json_agg(json_build_object(
-                    'id', t.id,
-                    'job_id', t.job_id,
-                    'task_id', t.task_id,
-                    'sensor', t.sensor,
-                    'status', t.status,
-                    'pcap_size', t.pcap_size,
-                    'temp_path', t.temp_path,
-                    'result_message', t.result_message,
-                    'start_time', t.start_time,
-                    'end_time', t.end_time,
-                    'created_at', t.created_at,
-                    'started_at', t.started_at,
-                    'completed_at', t.completed_at
-                )) as tasks
-            FROM jobs j
-            LEFT JOIN tasks t ON t.job_id = j.id
-        """
-
-        # Add username filter if provided
+        # Pick the prebuilt query for this filter shape
         params = []
         if username:
-            query += " WHERE j.submitted_by = %s"
             params.append(username)
+        if before_id is not None:
+            params.append(before_id)
+        params.append(limit)
+        query = _ALL_JOBS_QUERIES[bool(username), before_id is not None]
 
-        # Add group by and order by
-        query += """
-            GROUP BY j.id
-            ORDER BY j.id DESC
-        """
-
-        # Execute query
-        jobs = db(query, params)
-
-        # Format response
-        response = []
-        for job in jobs:
-            response.append({
-                'id': job[0],
-                'location': job[1],
-                'submitted_by': job[2],
-                'src_ip': str(job[3]) if job[3] else None,
-                'dst_ip': str(job[4]) if job[4] else None,
-                'event_time': job[5].isoformat() if job[5] else None,
-                'start_time': job[6].isoformat() if job[6] else None,
-                'end_time': job[7].isoformat() if job[7] else None,
-                'description': job[8],
-                'status': job[9],
-                'result_message': job[10],
-                'result_size': job[11],
-                'result_path': job[12],
-                'created_at': job[13].isoformat() if job[13] else None,
-                'started_at': job[14].isoformat() if job[14] else None,
-                'completed_at': job[15].isoformat() if job[15] else None,
-                'tasks': job[16] if job[16] and job[16][0] is not None else []
-            })
-
-        return jsonify({'jobs': response}), 200
+        # Stream the JSON text Postgres built for each job straight into the
+        # response. The first row is fetched here, so database errors still
+        # get a 500 before the stream starts.
+        jobs = db_stream_started(query, params)
+
+        return json_stream_response('jobs', jobs, encoded=True), 200
 
     except Exception as e:
         logger.error(f"Error getting all jobs: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
+
+@jobs_bp.route('/api/v1/jobs/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+@rate_limit()
+@request_conn()
+def cancel_job(job_id):
+    """Cancel a submitted or running job.
+
+    A single predicated UPDATE both checks and changes the status, so two
+    concurrent cancels (or a cancel racing the job processor) cannot both
+    act on the same row. The row is locked with SKIP LOCKED, so a request
+    that finds it busy fails fast with 409 instead of queueing behind the
+    lock. The follow-up SELECT only runs on failure, to tell the caller why.
+    """
+    try:
+        username = get_jwt_identity()
+        is_admin = get_jwt().get('role') == 'admin'
+
+        # Cancels the job and aborts its unfinished tasks in one statement;
+        # the aborted sensors come back for logging without another SELECT
+        cancelled = db("""
+            WITH target AS (
+                SELECT id FROM jobs
+                WHERE id = %s
+                AND (submitted_by = %s OR %s)
+                AND status IN %s
+                FOR UPDATE SKIP LOCKED
+            ), cancelled AS (
+                UPDATE jobs j
+                SET status = %s,
+                    result_message = 'Cancelled by user',
+                    completed_at = date_trunc('second', NOW())
+                FROM target
+                WHERE j.id = target.id
+                RETURNING j.id
+            ), aborted AS (
+                UPDATE tasks t
+                SET status = %s,
+                    result_message = 'Job cancelled',
+                    completed_at = NOW()
+                FROM cancelled
+                WHERE t.job_id = cancelled.id
+                AND t.status IN %s
+                RETURNING t.sensor
+            )
+            SELECT (SELECT id FROM cancelled), (SELECT array_agg(sensor) FROM aborted)
+        """, (job_id, username, is_admin, ACTIVE_STATUSES, STATUS['Cancelled'],
+              TASK_STATUS['ABORTED'], ACTIVE_TASK_STATUSES))
+
+        # db() returns None once its retries are spent
+        if cancelled is None:
+            return json_response({"error": "Database error"}), 500
+
+        cancelled_id, aborted_sensors = cancelled
+        if cancelled_id:
+            logger.info(f"Job {job_id} cancelled by {username}, aborted tasks: {aborted_sensors or []}")
+            return json_response({"message": "Job cancelled successfully"}), 200
+
+        job = db("SELECT submitted_by, status FROM jobs WHERE id = %s", (job_id,))
+        if not job:
+            return json_response({"error": "Job not found"}), 404
+
+        submitted_by, status = job[0]
+        if submitted_by != username and not is_admin:
+            return json_response({"error": "Not authorized to cancel this job"}), 403
+        if status in ACTIVE_STATUSES:
+            return json_response({"error": "Job is being modified, try again"}), 409
+        return json_response({"error": f"Cannot cancel job with status {status}"}), 400
+
+    except Exception as e:
+        logger.error(f"Error cancelling job {job_id}: {e}")
+        return json_response({"error": str(e)}), 500
+
+@jobs_bp.route('/api/v1/jobs/<int:job_id>', methods=['DELETE'])
+@jwt_required()
+@rate_limit()
+@request_conn()
+def delete_job(job_id):
+    """Delete a finished job, its tasks and its result files.
+
+    As in cancel_job, one predicated DELETE checks ownership and status,
+    skips a row locked by another request, removes it and returns the file
+    paths, so a successful delete is a single round-trip. The database rows are removed before responding; the
+    pcap files are queued for removal by the background file thread.
+    """
+    try:
+        username = get_jwt_identity()
+        is_admin = get_jwt().get('role') == 'admin'
+
+        # Tasks are removed by ON DELETE CASCADE; their paths are collected
+        # by the CTE, which still sees them
+        deleted = db("""
+            WITH target AS (
+                SELECT id FROM jobs
+                WHERE id = %s
+                AND (submitted_by = %s OR %s)
+                AND status IN %s
+                FOR UPDATE SKIP LOCKED
+            ), task_files AS (
+                SELECT array_agg(temp_path) AS paths
+                FROM tasks
+                WHERE job_id = %s AND temp_path IS NOT NULL
+            )
+            DELETE FROM jobs j
+            USING target
+            WHERE j.id = target.id
+            RETURNING j.result_path, (SELECT paths FROM task_files)
+        """, (job_id, username, is_admin, FINISHED_STATUSES, job_id))
+
+        if not deleted:
+            job = db("SELECT submitted_by, status FROM jobs WHERE id = %s", (job_id,))
+            if not job:
+                return json_response({"error": "Job not found"}), 404
+
+            submitted_by, status = job[0]
+            if submitted_by != username and not is_admin:
+                return json_response({"error": "Not authorized to delete this job"}), 403
+            if status in FINISHED_STATUSES:
+                return json_response({"error": "Job is being modified, try again"}), 409
+            return json_response({"error": f"Cannot delete job with status {status}"}), 400
+
+        result_path, task_paths = deleted
+
+        files = task_paths or []
+        if result_path:
+            files.append(result_path)
+        if files:
+            _file_gc_queue.put(files)
+
+        logger.info(f"Job {job_id} deleted by {username}")
+        return json_response({"message": "Job deleted successfully"}), 200
+
+    except Exception as e:
+        logger.error(f"Error deleting job {job_id}: {e}")
+        return json_response({"error": str(e)}), 500
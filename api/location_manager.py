@@ -2,65 +2,113 @@
 Location management for job processing
 PATH: api/location_manager.py
 """
-from multiprocessing import Process, Queue
+from multiprocessing import Process
 from typing import Dict, Optional, Tuple
 import threading
+import time
 from core import logger, db
-from api.job_process import start_job_proc, job_queues
+from api.job_process import start_job_proc, job_queues, JobPipe
+
+# Seconds a location's active-sensor check is reused when (re)starting its processor
+SENSOR_CHECK_TTL = 10
 
 class LocationManager:
     def __init__(self):
         self._job_procs: Dict[str, Process] = {}
-        self._job_queues: Dict[str, Queue] = {}
+        self._job_queues: Dict[str, JobPipe] = {}
         self._lock = threading.Lock() # To enforce singleton
+        # Locations whose processor is being started, set once it is settled
+        self._starting: Dict[str, threading.Event] = {}
+        # Location -> (checked at, has active sensors)
+        self._sensors_cache: Dict[str, Tuple[float, bool]] = {}
 
-    def get_location_queue(self, location: str) -> Tuple[Optional[Queue], str]:
+    def get_location_queue(self, location: str) -> Tuple[Optional[JobPipe], str]:
         """
         Get or create job queue for a location.
         Returns (queue, error_message). If queue is None, error_message explains why.
+
+        The lock only guards the dicts. The sensor query and the process
+        start run outside it, so one location starting up never holds up
+        submissions for the others. Concurrent requests for a location that
+        is being started wait for that start and then re-check.
         """
-        with self._lock:
-            # Check if we already have a running processor
-            if location in self._job_queues:
-                proc = self._job_procs[location]
-                if proc.is_alive():
-                    return self._job_queues[location], ""
-                else:
-                    # Clean up dead process
-                    logger.warning(f"Found dead processor for {location}, cleaning up")
-                    self._cleanup_location(location)
-
-            # Verify location has active sensors
-            try:
-                sensors = db("""
-                    SELECT name, fqdn 
-                    FROM sensors 
-                    WHERE location = %s 
-                    AND status != 'Offline'
-                """, (location,))
-
-                if not sensors:
-                    return None, f"No active sensors found for location {location}"
-
-            except Exception as e:
-                logger.error(f"Error checking sensors for {location}: {e}")
-                return None, f"Database error checking sensors: {e}"
-
-            # Create new processor
-            try:
-                logger.info(f"Starting job processor for location: {location}")
-                proc = start_job_proc(location)
-                self._job_procs[location] = proc
+        while True:
+            with self._lock:
+                # Check if we already have a running processor
+                if location in self._job_queues:
+                    proc = self._job_procs[location]
+                    if proc.is_alive():
+                        return self._job_queues[location], ""
+                    else:
+                        # Clean up dead process
+                        logger.warning(f"Found dead processor for {location}, cleaning up")
+                        self._cleanup_location(location)
+
+                starting = self._starting.get(location)
+                if starting is None:
+                    # Reserve the location; this request starts its processor
+                    starting = self._starting[location] = threading.Event()
+                    break
+
+            # Another request is starting this location
+            starting.wait()
+
+        try:
+            return self._start_location(location)
+        finally:
+            with self._lock:
+                del self._starting[location]
+            starting.set()
 
-                # Queue is created in start_job_proc
+    def _start_location(self, location: str) -> Tuple[Optional[JobPipe], str]:
+        """Check sensors and start a processor for a reserved location"""
+        # Verify location has active sensors
+        try:
+            if not self._has_active_sensors(location):
+                return None, f"No active sensors found for location {location}"
+
+        except Exception as e:
+            logger.error(f"Error checking sensors for {location}: {e}")
+            return None, f"Database error checking sensors: {e}"
+
+        # Create new processor
+        try:
+            logger.info(f"Starting job processor for location: {location}")
+            proc = start_job_proc(location)
+
+            # Queue is created in start_job_proc
+            with self._lock:
+                self._job_procs[location] = proc
                 self._job_queues[location] = job_queues[location]
 
-                return self._job_queues[location], ""
+            return job_queues[location], ""
 
-            except Exception as e:
-                logger.error(f"Failed to start processor for {location}: {e}")
+        except Exception as e:
+            logger.error(f"Failed to start processor for {location}: {e}")
+            with self._lock:
                 self._cleanup_location(location)
-                return None, f"Failed to start job processor: {e}"
+            return None, f"Failed to start job processor: {e}"
+
+    def _has_active_sensors(self, location: str) -> bool:
+        """Whether the location has a sensor that is not offline, cached for SENSOR_CHECK_TTL"""
+        now = time.monotonic()
+        cached = self._sensors_cache.get(location)
+        if cached and now - cached[0] < SENSOR_CHECK_TTL:
+            return cached[1]
+
+        found = bool(db("""
+            SELECT 1
+            FROM sensors 
+            WHERE location = %s 
+            AND status != 'Offline'
+            LIMIT 1
+        """, (location,)))
+        self._sensors_cache[location] = (now, found)
+        return found
+
+    def invalidate_sensors(self, location: str):
+        """Drop the cached sensor check after a location's sensors change"""
+        self._sensors_cache.pop(location, None)
 
     def _cleanup_location(self, location: str):
         """Clean up resources for a specific location"""
@@ -3,12 +3,13 @@ Log management endpoints for the PCAP Server API
 PATH: api/logs.py
 """
 import os
-import glob
+import re
+import time
+import logging
 from datetime import datetime
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 import configparser
-from collections import deque
 
 # Import shared resources
 from simpleLogger import SimpleLogger
@@ -26,35 +27,108 @@ config = configparser.ConfigParser()
 config.read('/opt/pcapserver/config.ini')
 LOG_PATH = config.get('LOG', 'log_path')
 
+# Log file names: *.log, *.log.<digit>*, *.out and *.err, skipping hidden
+# files as glob did. One precompiled match per directory entry.
+_LOG_RE = re.compile(r'[^.].*\.(log(\.\d.*)?|out|err)')
+
+# Seconds a log listing is reused while the directory is unchanged. File
+# sizes grow without touching the directory mtime, so it must stay short.
+LOG_FILES_CACHE_TTL = 2.0
+_log_files_cache = {'mtime': None, 'ts': 0.0, 'data': []}
+
+def get_log_files_cached():
+    """get_log_files, reused while LOG_PATH's mtime and the TTL both hold"""
+    mtime = os.stat(LOG_PATH).st_mtime_ns
+    now = time.monotonic()
+    cache = _log_files_cache
+    if cache['mtime'] == mtime and now - cache['ts'] < LOG_FILES_CACHE_TTL:
+        return cache['data']
+
+    data = get_log_files()
+    cache.update(mtime=mtime, ts=now, data=data)
+    return data
+
 def get_log_files():
-    """Get list of log files with metadata"""
+    """Get list of log files with metadata
+
+    One scandir pass lists the directory; DirEntry.stat() reuses what the
+    directory read already returned where the filesystem provides it.
+    """
     log_files = []
-    for ext in ['*.log', '*.log.[0-9]*', '*.out', '*.err']:
-        pattern = os.path.join(LOG_PATH, ext)
-        for file_path in glob.glob(pattern):
+    with os.scandir(LOG_PATH) as entries:
+        for entry in entries:
+            if not _LOG_RE.fullmatch(entry.name):
+                continue
             try:
-                stats = os.stat(file_path)
+                if not entry.is_file():
+                    continue
+                stats = entry.stat()
                 log_files.append({
-                    'name': os.path.basename(file_path),
+                    'name': entry.name,
                     'size': stats.st_size,
                     'modified': datetime.fromtimestamp(stats.st_mtime).isoformat()
                 })
             except Exception as e:
-                logger.error(f"Error getting stats for {file_path}: {e}")
+                logger.error(f"Error getting stats for {entry.path}: {e}")
     return sorted(log_files, key=lambda x: x['modified'], reverse=True)
 
+# Bytes read per step when scanning a log backwards from its end
+TAIL_BLOCK_SIZE = 64 * 1024
+
+def _tail_offset(f, num_lines):
+    """Byte offset in binary file f where its last num_lines lines begin
+
+    Reads fixed-size blocks backwards from the end, counting newlines, so
+    only the tail of a large log is ever read.
+    """
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return 0
+    f.seek(end - 1)
+    # A trailing newline ends the last line rather than starting a new one
+    skip = num_lines + (f.read(1) == b'\n')
+
+    offset = end
+    while offset > 0:
+        size = min(TAIL_BLOCK_SIZE, offset)
+        offset -= size
+        f.seek(offset)
+        block = f.read(size)
+        count = block.count(b'\n')
+        if count >= skip:
+            pos = len(block)
+            for _ in range(skip):
+                pos = block.rindex(b'\n', 0, pos)
+            return offset + pos + 1
+        skip -= count
+    return 0
+
+def tail_iter(file_path, num_lines=1000):
+    """Yield the last N lines of a file in order, one decoded line at a time
+
+    The file is opened before the first line is requested, so a missing or
+    unreadable file raises here rather than part way through a response.
+    """
+    f = open(file_path, 'rb')
+
+    def lines():
+        with f:
+            f.seek(_tail_offset(f, num_lines))
+            for line in f:
+                yield line.decode('utf-8', errors='replace')
+
+    return lines()
+
 def tail_file(file_path, num_lines=1000):
     """Get the last N lines of a file"""
     try:
-        logger.debug(f"Opening file for tailing: {file_path}")
-        with open(file_path, 'r') as f:
-            logger.debug("File opened successfully, reading lines")
-            lines = list(deque(f, num_lines))
-            logger.debug(f"Read {len(lines)} lines from file")
-            return lines
+        logger.debug("Opening file for tailing:", file_path)
+        lines = list(tail_iter(file_path, num_lines))
+        logger.debug("Read", len(lines), "lines from file")
+        return lines
     except Exception as e:
         logger.error(f"Error tailing file {file_path}: {e}")
-        logger.debug(f"Tail file exception details: {type(e).__name__}: {str(e)}")
+        logger.debug("Tail file exception details:", type(e).__name__, e)
         return []
 
 @logs_bp.route('/api/v1/logs', methods=['GET'])
@@ -64,7 +138,7 @@ def tail_file(file_path, num_lines=1000):
 def list_logs():
     """Get list of available log files"""
     try:
-        files = get_log_files()
+        files = get_log_files_cached()
         return jsonify({
             'files': files,
             'timestamp': datetime.now().isoformat()
@@ -78,32 +152,42 @@ def list_logs():
 @admin_required()
 @rate_limit()
 def get_log_content(log_file):
-    """Get content of a log file"""
+    """Get content of a log file
+
+    Query params:
+        format: 'text' streams the lines as text/plain as they are read,
+                instead of returning them as a JSON list
+    """
     try:
-        logger.debug(f"Attempting to get content for log file: {log_file}")
+        logger.debug("Attempting to get content for log file:", log_file)
 
         # Basic validation of log file path
         if not log_file or '..' in log_file:
-            logger.debug(f"Invalid log file path detected: {log_file}")
+            logger.debug("Invalid log file path detected:", log_file)
             return jsonify({"error": "Invalid log file path"}), 400
 
         # Get absolute path to log file
         log_path = os.path.join(LOG_PATH, log_file)
-        logger.debug(f"Full log path: {log_path}")
+        logger.debug("Full log path:", log_path)
 
         if not os.path.exists(log_path):
-            logger.debug(f"Log file not found at path: {log_path}")
+            logger.debug("Log file not found at path:", log_path)
             return jsonify({"error": "Log file not found"}), 404
 
-        # Log file stats
-        stats = os.stat(log_path)
-        logger.debug(f"Log file size: {stats.st_size} bytes")
-        logger.debug(f"Log file permissions: {oct(stats.st_mode)}")
+        # Log file stats, only gathered when debug output is on
+        if logger.isEnabledFor(logging.DEBUG):
+            stats = os.stat(log_path)
+            logger.debug("Log file size:", stats.st_size, "bytes")
+            logger.debug("Log file permissions:", oct(stats.st_mode))
 
         # Get last 1000 lines by default
         logger.debug("Attempting to read last 1000 lines")
+        if request.args.get('format') == 'text':
+            # Only one line is held in memory at a time
+            return Response(stream_with_context(tail_iter(log_path)), mimetype='text/plain'), 200
+
         lines = tail_file(log_path)
-        logger.debug(f"Successfully read {len(lines)} lines from log file")
+        logger.debug("Successfully read", len(lines), "lines from log file")
 
         return jsonify({
             'content': lines,
@@ -112,5 +196,5 @@ def get_log_content(log_file):
 
     except Exception as e:
         logger.error(f"Error getting log content: {str(e)}")
-        logger.debug(f"Exception details: {type(e).__name__}: {str(e)}")
+        logger.debug("Exception details:", type(e).__name__, e)
         return jsonify({"error": "Failed to get log content"}), 500
@@ -4,34 +4,46 @@ PATH: api/logs_ws.py
 """
 from flask import Blueprint, current_app
 from flask_sock import Sock, ConnectionClosed
-from flask_jwt_extended import decode_token
+from inotify_simple import INotify, flags
 import os
 import json
-import traceback
 from core import logger, rate_limit
+from api.auth import decode_token_cached
 
 # Create blueprint and socket
 logs_ws_bp = Blueprint('logs_ws', __name__)
 sock = Sock()
 
+# Milliseconds to wait for the file to change before checking the client is still there
+TAIL_WAIT_MS = 30000
+
+# Most lines and bytes sent in one WebSocket frame
+TAIL_BATCH_LINES = 64
+TAIL_BATCH_BYTES = 16384
+
 @sock.route('/api/v1/logs/tail/<path:log_file>')
 def tail_log(ws, log_file):
-    """WebSocket endpoint for tailing a log file"""
+    """WebSocket endpoint for tailing a log file
+
+    After authentication, each text frame carries one or more new lines of
+    the file joined by '\n' (no trailing newline). Lines available at the
+    same time are batched, up to TAIL_BATCH_LINES lines or
+    TAIL_BATCH_BYTES bytes per frame.
+    """
     client_id = os.urandom(4).hex()  # Generate unique ID for this connection
     logger.info(f"[{client_id}] New WebSocket connection initializing for {log_file}")
 
     try:
         # Wait for authentication token with timeout
         try:
-            logger.debug(f"[{client_id}] Waiting for auth message...")
+            logger.debug(f"[{client_id}]", "Waiting for auth message...")
             auth_message = ws.receive(timeout=5)
-            logger.debug(f"[{client_id}] Received auth message")
+            logger.debug(f"[{client_id}]", "Received auth message")
         except ConnectionClosed as e:
             logger.error(f"[{client_id}] Connection closed during auth: {e}")
             return
         except Exception as e:
-            logger.error(f"[{client_id}] Error receiving auth message: {e}")
-            logger.error(f"[{client_id}] Traceback: {traceback.format_exc()}")
+            logger.exception(f"[{client_id}] Error receiving auth message: {e}")
             return
 
         try:
@@ -44,10 +56,10 @@ def tail_log(ws, log_file):
 
             # Verify token and check admin role
             try:
-                decoded = decode_token(token)
+                decoded = decode_token_cached(token)
                 username = decoded.get('sub', 'unknown')
                 role = decoded.get('role', 'none')
-                logger.debug(f"[{client_id}] Auth success - User: {username}, Role: {role}")
+                logger.debug(f"[{client_id}]", "Auth success - User:", username, "Role:", role)
 
                 if role != 'admin':
                     logger.warning(f"[{client_id}] Non-admin access denied for user: {username}")
@@ -78,21 +90,37 @@ def tail_log(ws, log_file):
 
         logger.info(f"[{client_id}] Starting log tail for {log_file}")
 
-        # Open and tail the file
-        with open(log_path, 'r') as f:
+        # Open and tail the file. The thread sleeps in inotify until the
+        # kernel reports a write, rather than polling the file every second.
+        with open(log_path, 'rb') as f, INotify() as inotify:
+            inotify.add_watch(log_path, flags.MODIFY)
             # Seek to end
             f.seek(0, 2)
-            logger.debug(f"[{client_id}] Seeked to end of {log_file}")
+            logger.debug(f"[{client_id}]", "Seeked to end of", log_file)
 
+            # Lines are kept as bytes and decoded once per frame
+            batch = []
+            batch_bytes = 0
             try:
                 while True:
                     try:
                         line = f.readline()
                         if line:
-                            ws.send(line.rstrip('\n'))
-                        else:
-                            # No new lines, wait a bit
-                            ws.sleep(1)
+                            if line.endswith(b'\n'):
+                                line = line[:-1]
+                            batch.append(line)
+                            batch_bytes += len(line)
+                            if len(batch) < TAIL_BATCH_LINES and batch_bytes < TAIL_BATCH_BYTES:
+                                continue
+                        if batch:
+                            # One frame for everything read since the last send
+                            ws.send(b'\n'.join(batch).decode('utf-8', errors='replace'))
+                            batch = []
+                            batch_bytes = 0
+                        elif not inotify.read(timeout=TAIL_WAIT_MS) and not ws.connected:
+                            # Quiet file; stop once the client has gone
+                            logger.info(f"[{client_id}] Client disconnected")
+                            return
                     except ConnectionClosed as e:
                         logger.info(f"[{client_id}] Client disconnected: {e}")
                         return
@@ -100,16 +128,14 @@ def tail_log(ws, log_file):
                         logger.error(f"[{client_id}] Error sending log line: {e}")
                         return
             except Exception as e:
-                logger.error(f"[{client_id}] Error while tailing: {e}")
-                logger.error(f"[{client_id}] Traceback: {traceback.format_exc()}")
+                logger.exception(f"[{client_id}] Error while tailing: {e}")
                 ws.send(f"Error: {str(e)}")
                 return
 
     except ConnectionClosed as e:
         logger.error(f"[{client_id}] WebSocket connection closed: {e}")
     except Exception as e:
-        logger.error(f"[{client_id}] Unexpected error: {e}")
-        logger.error(f"[{client_id}] Traceback: {traceback.format_exc()}")
+        logger.exception(f"[{client_id}] Unexpected error: {e}")
         try:
             ws.send(f"Error: {str(e)}")
         except:
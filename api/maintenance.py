@@ -2,36 +2,97 @@
 Maintenance operations for the PCAP Server API
 PATH: api/maintenance.py
 """
-from datetime import datetime, timezone
-import threading
+from threading import Thread, Event, Lock
+import atexit
 import time
-import traceback
 
 from core import logger, config
 from api.auth import cleanup_old_sessions
+from api.network_tasks import cleanup_old_data, refresh_views
 
-def run_maintenance_operations():
-    """Run periodic maintenance operations"""
-    while True:
-        try:
-            # Run session cleanup every hour
-            cleanup_old_sessions()
+class MaintenanceScheduler(Thread):
+    """Runs every periodic maintenance job on one thread.
+
+    Each job is a callable run every `interval` seconds. A job that raises
+    or returns False is retried after error_wait seconds, backing off up to
+    its own interval. Jobs that fall due together run in the order they
+    were added.
+    """
+    def __init__(self):
+        super().__init__()
+        self.stop_event = Event()
+        self.daemon = True
+        self.name = "MaintenanceScheduler"
+        self.error_wait = 60  # 1 minute
+        self.jobs = []  # [name, func, interval, next_run, consecutive_errors]
 
-            # Sleep for an hour
-            time.sleep(3600)
+    def add_job(self, name, func, interval):
+        """Schedule func every interval seconds, first run on start"""
+        self.jobs.append([name, func, interval, 0.0, 0])
 
+    def run_job(self, job):
+        """Run one job and schedule its next run"""
+        name, func, interval, _, errors = job
+        try:
+            ok = func() is not False
         except Exception as e:
-            logger.error(f"Error in maintenance operations: {e}")
-            logger.error(traceback.format_exc())
-            # Sleep for a minute before retrying on error
-            time.sleep(60)
+            logger.exception(f"Error in maintenance job {name}: {e}")
+            ok = False
+
+        if ok:
+            job[4] = 0
+            wait_time = interval
+        else:
+            job[4] = errors + 1
+            wait_time = min(self.error_wait * job[4], interval)
+            logger.warning(f"Maintenance job {name} failed, retrying in {wait_time}s")
+        job[3] = time.monotonic() + wait_time
+
+    def run(self):
+        """Run due jobs, then sleep until the next one or a stop request"""
+        logger.info(f"Maintenance scheduler started with jobs: {[job[0] for job in self.jobs]}")
+        while not self.stop_event.is_set():
+            for job in self.jobs:
+                if self.stop_event.is_set():
+                    return
+                if job[3] <= time.monotonic():
+                    self.run_job(job)
+
+            next_run = min((job[3] for job in self.jobs), default=time.monotonic() + self.error_wait)
+            self.stop_event.wait(max(next_run - time.monotonic(), 0))
+
+    def stop(self):
+        """Stop the scheduler"""
+        logger.info("Stopping maintenance scheduler")
+        self.stop_event.set()
+
+maintenance_scheduler = MaintenanceScheduler()
+maintenance_scheduler.add_job('session_cleanup', cleanup_old_sessions, 3600)  # Every hour
+maintenance_scheduler.add_job('subnet_cleanup', cleanup_old_data, 300)  # Every 5 minutes
+maintenance_scheduler.add_job('network_views', refresh_views, 300)  # Every 5 minutes
+
+# Set once the scheduler has been started in this process
+_started = False
+_start_lock = Lock()
+
+def stop_maintenance():
+    """Wake the scheduler out of its wait and let it exit"""
+    if maintenance_scheduler.is_alive():
+        maintenance_scheduler.stop()
 
 def start_maintenance_thread():
-    """Start the maintenance operations thread"""
-    maintenance_thread = threading.Thread(
-        target=run_maintenance_operations,
-        name="maintenance_operations",
-        daemon=True
-    )
-    maintenance_thread.start()
-    logger.info("Started maintenance operations thread") 
\ No newline at end of file
+    """Start the maintenance scheduler thread, once per process
+
+    Both server.py and create_app() call this; later calls are no-ops, so
+    the views are never refreshed by two threads at once. server.py stops
+    the scheduler from its signal handler; the atexit hook covers apps
+    built with create_app() under another server.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    maintenance_scheduler.start()
+    atexit.register(stop_maintenance)
+    logger.info("Started maintenance scheduler thread")
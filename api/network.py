@@ -2,15 +2,17 @@
 Network visualization endpoints for the PCAP Server API
 PATH: api/network.py
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 from datetime import datetime, timezone
-import json
+import itertools
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 # Import shared resources
 from simpleLogger import SimpleLogger
-from core import db, rate_limit
-from cache_utils import redis_client, get_cache_key
+from core import db, db_stream, rate_limit, json_response
+from cache_utils import redis_client, get_cache_key, compress_value, decompress_value
 
 # Initialize logger
 logger = SimpleLogger('network')
@@ -18,6 +20,75 @@ logger = SimpleLogger('network')
 # Create blueprint
 network_bp = Blueprint('network', __name__)
 
+# Seconds a cached subnet-location-counts response is served
+SUBNET_LOCATION_COUNTS_TTL = 60
+
+# Seconds the connections list is cached
+CONNECTIONS_CACHE_TTL = 60
+
+# The connections list is served stale-while-revalidate: it counts as
+# fresh for CONNECTIONS_CACHE_TTL (CONNECTIONS_EMPTY_TTL when empty), but
+# stays in Redis for CONNECTIONS_STALE_TTL. A stale hit is still served and
+# one background refresh is started, guarded by a lock held for at most
+# CONNECTIONS_REFRESH_LOCK_TTL, so expiry never sends every client to the
+# GROUP BY at once.
+CONNECTIONS_EMPTY_TTL = 5
+CONNECTIONS_STALE_TTL = 600
+CONNECTIONS_REFRESH_LOCK_TTL = 30
+
+CONNECTIONS_KEY = get_cache_key('analytics', 'network', 'connections', 'all')
+CONNECTIONS_FRESH_KEY = get_cache_key('analytics', 'network', 'connections', 'fresh')
+CONNECTIONS_LOCK_KEY = get_cache_key('analytics', 'network', 'connections', 'refresh_lock')
+
+# Runs background refreshes of the connections list
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='network_refresh')
+
+_LOCATIONS_QUERY = """
+    SELECT site, name, latitude, longitude, description, color
+    FROM locations
+    ORDER BY name
+"""
+
+_CONNECTIONS_QUERY = """
+    SELECT
+        src_location,
+        dst_location,
+        COUNT(*) as unique_subnets,
+        SUM(packet_count)::bigint as total_packets,
+        MIN(first_seen) as earliest_seen,
+        MAX(last_seen) as latest_seen
+    FROM subnet_location_map
+    GROUP BY src_location, dst_location
+    ORDER BY total_packets DESC
+"""
+
+def _location_row(loc):
+    """Response dict for a _LOCATIONS_QUERY row"""
+    return {
+        'site': loc[0],
+        'name': loc[1],
+        'latitude': float(loc[2]),
+        'longitude': float(loc[3]),
+        'description': loc[4],
+        'color': loc[5]
+    }
+
+def _connection_row(conn):
+    """Response dict for a _CONNECTIONS_QUERY row
+
+    Every aggregate comes back from Postgres as a non-null bigint (the
+    summed columns are NOT NULL and each group has a row), so the values
+    are already Python ints and need no per-column coercion.
+    """
+    return {
+        'src_location': conn[0],
+        'dst_location': conn[1],
+        'unique_subnets': conn[2],
+        'packet_count': conn[3],
+        'earliest_seen': conn[4],
+        'latest_seen': conn[5]
+    }
+
 def validate_hours(hours_str):
     """Validate hours parameter"""
     if hours_str is None:
@@ -38,17 +109,56 @@ def validate_location(location):
     result = db("SELECT site FROM locations WHERE site = %s", [location])
     return location if result and len(result) > 0 else None
 
+# Encoded locations list. Locations are reference data, so they are loaded
+# once (at startup, or on first use) and kept in memory until
+# clear-cache drops them.
+_locations_body = None
+
+def load_locations():
+    """Load the locations table into _locations_body and return it"""
+    global _locations_body
+    locations = db(_LOCATIONS_QUERY)
+    if locations is None:
+        raise RuntimeError("Database query returned None for locations")
+    _locations_body = orjson.dumps([_location_row(loc) for loc in locations])
+    return _locations_body
+
+def _cache_connections(body):
+    """Store an encoded connections list and mark it fresh"""
+    fresh_ttl = CONNECTIONS_EMPTY_TTL if body == b'[]' else CONNECTIONS_CACHE_TTL
+    redis_client.pipeline(transaction=False) \
+        .setex(CONNECTIONS_KEY, CONNECTIONS_STALE_TTL, compress_value(body)) \
+        .setex(CONNECTIONS_FRESH_KEY, fresh_ttl, 1) \
+        .execute()
+
+def _refresh_connections():
+    """Reload the connections list into the cache; runs on _refresh_executor"""
+    try:
+        rows = db(_CONNECTIONS_QUERY)
+        _cache_connections(orjson.dumps([_connection_row(conn) for conn in rows or []]))
+    except Exception as e:
+        logger.error(f"Error refreshing cached connections: {e}")
+    finally:
+        try:
+            redis_client.delete(CONNECTIONS_LOCK_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to release connections refresh lock: {e}")
+
+def _revalidate_connections():
+    """Start a background refresh unless one is already running"""
+    try:
+        if redis_client.set(CONNECTIONS_LOCK_KEY, 1, nx=True, ex=CONNECTIONS_REFRESH_LOCK_TTL):
+            _refresh_executor.submit(_refresh_connections)
+    except Exception as e:
+        logger.warning(f"Failed to start connections refresh: {e}")
+
 @network_bp.route('/api/v1/network/locations/clear-cache', methods=['POST'])
 @jwt_required()
 def clear_locations_cache():
     """Clear the locations cache"""
-    try:
-        cache_key = get_cache_key('analytics', 'network', 'locations')
-        redis_client.delete(cache_key)
-        return jsonify({"message": "Locations cache cleared"}), 200
-    except Exception as e:
-        logger.error(f"Error clearing locations cache: {e}")
-        return jsonify({"error": "Failed to clear cache"}), 500
+    global _locations_body
+    _locations_body = None
+    return json_response({"message": "Locations cache cleared"}), 200
 
 @network_bp.route('/api/v1/network/locations', methods=['GET'])
 @jwt_required()
@@ -56,69 +166,25 @@ def clear_locations_cache():
 def get_locations():
     """Get all NASA center locations"""
     try:
-        # Try to get from cache first
-        cache_key = get_cache_key('analytics', 'network', 'locations')
-        cached_data = redis_client.get(cache_key)
-
-        if cached_data:
+        body = _locations_body
+        cached = body is not None
+        if not cached:
             try:
-                locations = json.loads(cached_data)
-                return jsonify({
-                    'locations': locations,
-                    'cached': True,
-                    'timestamp': datetime.now(timezone.utc).isoformat()
-                }), 200
-            except json.JSONDecodeError:
-                # If cache is corrupted, ignore it
-                logger.warning("Corrupted cache data for locations")
-                redis_client.delete(cache_key)
-
-        # If not in cache, get from database
-        try:
-            logger.debug("Fetching locations from database")
-            locations = db("""
-                SELECT site, name, latitude, longitude, description, color
-                FROM locations
-                ORDER BY name
-            """)
-
-            if locations is None:
-                logger.error("Database query returned None for locations")
-                return jsonify({"error": "Database error"}), 500
-
-            # Format the response
-            location_list = [{
-                'site': loc[0],
-                'name': loc[1],
-                'latitude': float(loc[2]),
-                'longitude': float(loc[3]),
-                'description': loc[4],
-                'color': loc[5]
-            } for loc in locations]
-
-            # Cache the results for 1 hour (locations don't change often)
-            try:
-                redis_client.setex(
-                    cache_key,
-                    3600,  # 1 hour
-                    json.dumps(location_list)
-                )
+                logger.debug("Fetching locations from database")
+                body = load_locations()
             except Exception as e:
-                logger.warning(f"Failed to cache locations: {e}")
-
-            return jsonify({
-                'locations': location_list,
-                'cached': False,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }), 200
+                logger.error(f"Database error getting locations: {e}")
+                return json_response({"error": "Database error"}), 500
 
-        except Exception as e:
-            logger.error(f"Database error getting locations: {e}")
-            return jsonify({"error": "Database error"}), 500
+        return json_response({
+            'locations': orjson.Fragment(body),
+            'cached': cached,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 200
 
     except Exception as e:
         logger.error(f"Error getting locations: {e}")
-        return jsonify({"error": "Failed to get location data"}), 500
+        return json_response({"error": "Failed to get location data"}), 500
 
 @network_bp.route('/api/v1/network/connections', methods=['GET'])
 @jwt_required()
@@ -145,82 +211,185 @@ def get_connections():
         # Validate query parameters
         hours = validate_hours(request.args.get('hours'))
         if request.args.get('hours') and hours is None:
-            return jsonify({
+            return json_response({
                 "error": "Invalid hours parameter. Must be a positive integer."
             }), 400
 
         location = validate_location(request.args.get('location'))
         if request.args.get('location') and location is None:
-            return jsonify({
+            return json_response({
                 "error": "Invalid location parameter. Location does not exist."
             }), 400
 
-        # Try to get from cache first
-        cache_key = get_cache_key('analytics', 'network', 'connections', 'all')
-        cached_data = redis_client.get(cache_key)
+        # Try to get from cache first; a stale copy is served while it is refreshed
+        try:
+            cached_data, fresh = redis_client.pipeline(transaction=False) \
+                .get(CONNECTIONS_KEY).exists(CONNECTIONS_FRESH_KEY).execute()
+            cached_data = decompress_value(cached_data)
+        except Exception as e:
+            logger.warning(f"Failed to read cached connections: {e}")
+            cached_data = None
 
         if cached_data:
+            if not fresh:
+                _revalidate_connections()
+            return json_response({
+                'connections': orjson.Fragment(cached_data),
+                'cached': True,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }), 200
+
+        try:
+            # Rows come from a server-side cursor and are encoded one at a
+            # time as they are sent. The first row is fetched here so a
+            # database failure still gets a 500 before the stream starts.
+            rows = db_stream(_CONNECTIONS_QUERY, itersize=1000)
+            first = next(rows, None)
+        except Exception as e:
+            logger.error(f"Database error getting connections: {e}")
+            return json_response({"error": "Database error"}), 500
+
+        def generate():
+            # Encoded rows are kept so the finished array can be cached
+            parts = []
+            yield b'{"connections":['
             try:
-                connections = json.loads(cached_data)
-                return jsonify({
-                    'connections': connections,
-                    'cached': True,
-                    'timestamp': datetime.now(timezone.utc).isoformat()
-                }), 200
-            except json.JSONDecodeError:
-                # If cache is corrupted, ignore it
-                logger.warning("Corrupted cache data for connections")
-                redis_client.delete(cache_key)
+                for conn in itertools.chain([first], rows) if first else ():
+                    part = orjson.dumps(_connection_row(conn))
+                    if parts:
+                        yield b','
+                    parts.append(part)
+                    yield part
+            except Exception as e:
+                # Headers are already sent; log, close the document, skip caching
+                logger.error(f"Error streaming connections: {e}")
+                parts = None
+
+            yield b'],"cached":false,"timestamp":' + orjson.dumps(datetime.now(timezone.utc).isoformat()) + b'}'
+
+            if parts is not None:
+                # Cache the results
+                try:
+                    _cache_connections(b'[' + b','.join(parts) + b']')
+                except Exception as e:
+                    logger.warning(f"Failed to cache connections: {e}")
+
+        return Response(stream_with_context(generate()), mimetype='application/json'), 200
 
+    except Exception as e:
+        logger.error(f"Error getting connections: {e}")
+        return json_response({"error": "Failed to get connection data"}), 500
+
+@network_bp.route('/api/v1/network/bundle', methods=['GET'])
+@jwt_required()
+@rate_limit()
+def get_network_bundle():
+    """Get the locations and connections lists in one response
+
+    For dashboards that need both. Locations come from memory; the
+    connections cache entry and its freshness marker are read in one
+    pipelined round-trip, cached JSON is passed through without being
+    parsed, and a miss is loaded from the database and cached again.
+    """
+    try:
         try:
-            # Get all connections from materialized view
-            connections = db("""
-                SELECT
-                    src_location,
-                    dst_location,
-                    COUNT(*) as unique_subnets,
-                    SUM(packet_count) as total_packets,
-                    MIN(first_seen) as earliest_seen,
-                    MAX(last_seen) as latest_seen
-                FROM subnet_location_map
-                GROUP BY src_location, dst_location
-                ORDER BY total_packets DESC
-            """)
-
-            if connections is None:
-                logger.error("Database query returned None for connections")
-                return jsonify({"error": "Database error"}), 500
-
-            # Format the response
-            connection_list = [{
-                'src_location': conn[0],
-                'dst_location': conn[1],
-                'unique_subnets': int(conn[2]) if conn[2] is not None else 0,
-                'packet_count': int(conn[3]) if conn[3] is not None else 0,
-                'earliest_seen': int(conn[4]) if conn[4] is not None else 0,
-                'latest_seen': int(conn[5]) if conn[5] is not None else 0
-            } for conn in connections]
-
-            # Cache the results for 1 minute
+            cached_connections, connections_fresh = redis_client.pipeline(transaction=False) \
+                .get(CONNECTIONS_KEY).exists(CONNECTIONS_FRESH_KEY).execute()
+            cached_connections = decompress_value(cached_connections)
+        except Exception as e:
+            logger.warning(f"Failed to read cached network bundle: {e}")
+            cached_connections = None
+
+        locations_body = _locations_body
+        locations_cached = locations_body is not None
+        if not locations_cached:
+            locations_body = load_locations()
+
+        connections_body = None
+        if cached_connections:
+            if not connections_fresh:
+                _revalidate_connections()
+            connections = orjson.Fragment(cached_connections)
+        else:
+            connections_body = orjson.dumps([_connection_row(conn) for conn in db(_CONNECTIONS_QUERY)])
+            connections = orjson.Fragment(connections_body)
+
+        if connections_body is not None:
             try:
-                redis_client.setex(
-                    cache_key,
-                    60,  # 1 minute
-                    json.dumps(connection_list)
-                )
+                _cache_connections(connections_body)
             except Exception as e:
-                logger.warning(f"Failed to cache connections: {e}")
+                logger.warning(f"Failed to cache network bundle: {e}")
 
-            return jsonify({
-                'connections': connection_list,
-                'cached': False,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }), 200
+        return json_response({
+            'locations': orjson.Fragment(locations_body),
+            'connections': connections,
+            'cached': locations_cached and connections_body is None,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 200
 
+    except Exception as e:
+        logger.error(f"Error getting network bundle: {e}")
+        return json_response({"error": "Failed to get network data"}), 500
+
+@network_bp.route('/api/v1/subnet-location-counts', methods=['GET'])
+@jwt_required()
+@rate_limit()
+def get_subnet_location_counts():
+    """Get the number of subnet mappings between each pair of locations
+
+    Reads the subnet_location_counts materialized view, which stores
+    lowercased locations, so each filter is an equality match on its index.
+
+    Query Parameters:
+    - src: Filter by source location (case-insensitive)
+    - dst: Filter by destination location (case-insensitive)
+
+    Returns {"counts": [{src_location, dst_location, count}, ...]}, largest
+    count first.
+    """
+    try:
+        src = request.args.get('src')
+        dst = request.args.get('dst')
+
+        # Dashboards poll this; serve the encoded body from cache when fresh
+        cache_key = get_cache_key('analytics', 'network', 'subnet_location_counts',
+                                  src.lower() if src else '*', dst.lower() if dst else '*')
+        try:
+            cached_body = decompress_value(redis_client.get(cache_key))
+            if cached_body:
+                return Response(cached_body, mimetype='application/json'), 200
         except Exception as e:
-            logger.error(f"Database error getting connections: {e}")
-            return jsonify({"error": "Database error"}), 500
+            logger.warning(f"Failed to read cached subnet location counts: {e}")
+
+        query = "SELECT src_location, dst_location, count FROM subnet_location_counts"
+        conditions = []
+        params = []
+        if src:
+            conditions.append("src_location = %s")
+            params.append(src.lower())
+        if dst:
+            conditions.append("dst_location = %s")
+            params.append(dst.lower())
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY count DESC"
+
+        rows = db(query, params)
+
+        body = orjson.dumps({'counts': [{
+            'src_location': row[0],
+            'dst_location': row[1],
+            'count': int(row[2])
+        } for row in rows or []]})
+
+        # The view itself is only refreshed by the maintenance thread
+        try:
+            redis_client.setex(cache_key, SUBNET_LOCATION_COUNTS_TTL, compress_value(body))
+        except Exception as e:
+            logger.warning(f"Failed to cache subnet location counts: {e}")
+
+        return Response(body, mimetype='application/json'), 200
 
     except Exception as e:
-        logger.error(f"Error getting connections: {e}")
-        return jsonify({"error": "Failed to get connection data"}), 500
+        logger.error(f"Error getting subnet location counts: {e}")
+        return json_response({"error": "Failed to get subnet location counts"}), 500
@@ -2,24 +2,82 @@
 User preferences endpoints and functionality
 PATH: api/preferences.py
 """
-from flask import Blueprint, jsonify, request, Response
+from flask import Blueprint, request, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from core import db, logger, rate_limit
-import traceback
-import json
+from core import db, db_prepared, logger, rate_limit, json_response, config
+from cache_utils import redis_client
+import logging
+import orjson
 import math
+import os
+import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
 
 preferences_bp = Blueprint('preferences', __name__)
 
+# Encoded preferences per user, written through by update_preferences
+PREFS_CACHE_KEY = 'user_prefs:{}'
+PREFS_CACHE_TTL = 3600  # 1 hour
+
+def cache_preferences(username, body):
+    """Store a user's encoded preferences body, ignoring Redis errors"""
+    try:
+        redis_client.setex(PREFS_CACHE_KEY.format(username), PREFS_CACHE_TTL, body)
+    except Exception as e:
+        logger.warning(f"Failed to cache preferences for {username}: {e}")
+
+# SVG fragments for generate_avatar_svg, filled in with str.format. The
+# output is minified onto one line and fractional values are written to
+# two decimal places, which is finer than a 100x100 viewBox can show.
+_SVG_HEADER = (
+    '<svg width="100" height="100" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg">'
+    '<defs>'
+    '<linearGradient id="grad" x1="0%" y1="0%" x2="100%" y2="100%">'
+    '<stop offset="0%" style="stop-color:{color1};stop-opacity:1"/>'
+    '<stop offset="100%" style="stop-color:{color2};stop-opacity:1"/>'
+    '</linearGradient>'
+    '<filter id="shadow"><feDropShadow dx="0" dy="0" stdDeviation="2" flood-opacity="0.3"/></filter>'
+    '</defs>'
+    '<rect width="100" height="100" fill="url(#grad)"/>'
+)
+_SVG_FOOTER = (
+    '<text x="50" y="50" text-anchor="middle" dominant-baseline="central" '
+    'font-family="Arial, sans-serif" font-size="40" font-weight="bold" '
+    'fill="rgba(255,255,255,0.9)" filter="url(#shadow)">{initial}</text>'
+    '</svg>'
+)
+_CIRCLE_TMPL = '<circle cx="{x}" cy="{y}" r="{r:.2f}" fill="{c}" opacity="{o:.2f}"/>'
+_RECT_TMPL = '<rect x="{x:.2f}" y="{y:.2f}" width="{w}" height="{w}" fill="{c}" opacity="{o:.2f}" transform="rotate({a} {cx} {cy})"/>'
+_POLY_TMPL = '<polygon points="{p}" fill="{c}" opacity="{o:.2f}"/>'
+_DOT_TMPL = '<circle cx="{x}" cy="{y}" r="{r:.2f}" fill="{c}"/>'
+_CROSS_TMPL = ('<g transform="rotate({a} {x} {y})">'
+               '<rect x="{hx:.2f}" y="{hy:.2f}" width="{s}" height="{t:.2f}" fill="{c}"/>'
+               '<rect x="{vx:.2f}" y="{vy:.2f}" width="{t:.2f}" height="{s}" fill="{c}"/>'
+               '</g>')
+_DIAMOND_TMPL = '<polygon points="{p}" fill="{c}"/>'
+
+# Most LCG draws one avatar can use: 7 for the gradient, up to 9 per
+# background shape (4) and up to 8 per foreground shape (3)
+_AVATAR_DRAWS = 7 + 4 * 9 + 3 * 8
+
+# Unit-circle (dx, dy) for the six hexagon corners, 60 degrees apart
+_HEX_OFFSETS = tuple((math.cos(math.radians(j * 60)), math.sin(math.radians(j * 60))) for j in range(6))
+
 def generate_avatar_svg(seed: int, initial: str) -> str:
-    """Generate a colorful geometric SVG avatar based on seed"""
-    # Use seed to generate consistent colors and patterns
-    rng = seed
+    """Generate a colorful geometric SVG avatar based on seed
 
-    def get_next_random():
-        nonlocal rng
+    Every element is appended to one list of parts, joined once at the end.
+    """
+    # Use seed to generate consistent colors and patterns. Every draw the
+    # avatar can need is produced up front in one loop, then handed out in
+    # order by the list iterator's C-level __next__.
+    rng = seed
+    draws = []
+    for _ in range(_AVATAR_DRAWS):
         rng = (1103515245 * rng + 12345) & 0x7fffffff
-        return rng
+        draws.append(rng)
+    get_next_random = iter(draws).__next__
 
     def get_color():
         """Generate vibrant colors using HSL color space"""
@@ -33,8 +91,7 @@ def generate_avatar_svg(seed: int, initial: str) -> str:
     color1 = get_color()
     color2 = get_color()
 
-    # Generate pattern elements
-    pattern = []
+    parts = [_SVG_HEADER.format(color1=color1, color2=color2)]
 
     # Add some background shapes
     for i in range(4):  # Background shapes
@@ -47,20 +104,17 @@ def generate_avatar_svg(seed: int, initial: str) -> str:
         color = get_color()
 
         if shape_type == 0:  # Circle
-            pattern.append(f'<circle cx="{x}" cy="{y}" r="{size/2}" fill="{color}" opacity="{opacity}" />')
+            parts.append(_CIRCLE_TMPL.format(x=x, y=y, r=size/2, c=color, o=opacity))
         elif shape_type == 1:  # Square
-            pattern.append(f'<rect x="{x-size/2}" y="{y-size/2}" width="{size}" height="{size}" fill="{color}" opacity="{opacity}" transform="rotate({get_next_random() % 45} {x} {y})" />')
+            parts.append(_RECT_TMPL.format(x=x-size/2, y=y-size/2, w=size, c=color, o=opacity,
+                                           a=get_next_random() % 45, cx=x, cy=y))
         elif shape_type == 2:  # Triangle
-            points = f"{x},{y-size/2} {x-size/2},{y+size/2} {x+size/2},{y+size/2}"
-            pattern.append(f'<polygon points="{points}" fill="{color}" opacity="{opacity}" />')
+            points = f"{x},{y-size/2:.2f} {x-size/2:.2f},{y+size/2:.2f} {x+size/2:.2f},{y+size/2:.2f}"
+            parts.append(_POLY_TMPL.format(p=points, c=color, o=opacity))
         else:  # Hexagon
-            points = []
-            for j in range(6):
-                angle = j * 60
-                px = x + size/2 * math.cos(math.radians(angle))
-                py = y + size/2 * math.sin(math.radians(angle))
-                points.append(f"{px},{py}")
-            pattern.append(f'<polygon points="{" ".join(points)}" fill="{color}" opacity="{opacity}" />')
+            half = size / 2
+            points = " ".join(f"{x + dx*half:.2f},{y + dy*half:.2f}" for dx, dy in _HEX_OFFSETS)
+            parts.append(_POLY_TMPL.format(p=points, c=color, o=opacity))
 
     # Add foreground elements
     for i in range(3):  # Foreground shapes
@@ -71,47 +125,69 @@ def generate_avatar_svg(seed: int, initial: str) -> str:
 
         shape_type = get_next_random() % 3
         if shape_type == 0:  # Small circles
-            pattern.append(f'<circle cx="{x}" cy="{y}" r="{size/3}" fill="{color}" />')
+            parts.append(_DOT_TMPL.format(x=x, y=y, r=size/3, c=color))
         elif shape_type == 1:  # Cross
             thickness = size / 8
-            pattern.append(f'''
-                <g transform="rotate({get_next_random() % 45} {x} {y})">
-                    <rect x="{x-size/2}" y="{y-thickness/2}" width="{size}" height="{thickness}" fill="{color}" />
-                    <rect x="{x-thickness/2}" y="{y-size/2}" width="{thickness}" height="{size}" fill="{color}" />
-                </g>
-            ''')
+            parts.append(_CROSS_TMPL.format(a=get_next_random() % 45, x=x, y=y,
+                                            hx=x-size/2, hy=y-thickness/2,
+                                            vx=x-thickness/2, vy=y-size/2,
+                                            s=size, t=thickness, c=color))
         else:  # Diamond
-            points = f"{x},{y-size/2} {x+size/3},{y} {x},{y+size/2} {x-size/3},{y}"
-            pattern.append(f'<polygon points="{points}" fill="{color}" />')
-
-    # Create SVG with gradient background, pattern, and text overlay
-    svg = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg width="100" height="100" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg">
-    <defs>
-        <linearGradient id="grad" x1="0%" y1="0%" x2="100%" y2="100%">
-            <stop offset="0%" style="stop-color:{color1};stop-opacity:1" />
-            <stop offset="100%" style="stop-color:{color2};stop-opacity:1" />
-        </linearGradient>
-        <filter id="shadow">
-            <feDropShadow dx="0" dy="0" stdDeviation="2" flood-opacity="0.3"/>
-        </filter>
-    </defs>
-    <rect width="100" height="100" fill="url(#grad)" />
-    {"".join(pattern)}
-    <text
-        x="50"
-        y="50"
-        text-anchor="middle"
-        dominant-baseline="central"
-        font-family="Arial, sans-serif"
-        font-size="40"
-        font-weight="bold"
-        fill="rgba(255,255,255,0.9)"
-        filter="url(#shadow)"
-    >{initial}</text>
-</svg>'''
-
-    return svg
+            points = f"{x},{y-size/2:.2f} {x+size/3:.2f},{y} {x},{y+size/2:.2f} {x-size/3:.2f},{y}"
+            parts.append(_DIAMOND_TMPL.format(p=points, c=color))
+
+    # Text overlay
+    parts.append(_SVG_FOOTER.format(initial=initial))
+    return "".join(parts)
+
+# Users' avatars persist here across restarts and between workers. The
+# directory is created on first write; if it cannot be, avatars are only
+# cached in memory.
+AVATAR_PATH = config.get('DOWNLOADS', 'avatar_path', fallback='/data/avatars')
+
+def _avatar_file(seed: int, initial: str) -> str:
+    """Disk cache path for an avatar; the initial goes in as a code point"""
+    return os.path.join(AVATAR_PATH, f"{seed}-{ord(initial):x}.svg")
+
+def store_user_avatar(seed, username: str) -> None:
+    """Write a user's avatar to the disk cache if it is not there yet
+
+    Called where a real user's seed is read or set, so the public avatar
+    endpoint never writes files or queries the database itself.
+    """
+    if not isinstance(seed, int) or isinstance(seed, bool) or not username:
+        return
+    initial = username[0].upper()
+    path = _avatar_file(seed, initial)
+    if os.path.exists(path):
+        return
+
+    svg = generate_avatar_svg(seed, initial).encode()
+    tmp_path = None
+    try:
+        os.makedirs(AVATAR_PATH, exist_ok=True)
+        # Write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=AVATAR_PATH, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(svg)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to store avatar {path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+@lru_cache(maxsize=8192)
+def render_avatar(seed: int, initial: str) -> bytes:
+    """Encoded avatar SVG, reused for recently requested seeds
+
+    A miss here reads the copy store_user_avatar left on disk, and only
+    generates the SVG in memory if there is none.
+    """
+    try:
+        with open(_avatar_file(seed, initial), 'rb') as f:
+            return f.read()
+    except OSError:
+        return generate_avatar_svg(seed, initial).encode()
 
 @preferences_bp.route('/api/v1/preferences', methods=['GET'])
 @jwt_required()
@@ -122,34 +198,64 @@ def get_preferences():
         username = get_jwt_identity()
         logger.info(f"Getting preferences for user: {username}")
 
-        # Get user preferences from database
+        try:
+            cached_body = redis_client.get(PREFS_CACHE_KEY.format(username))
+            if cached_body:
+                return Response(cached_body, mimetype='application/json'), 200
+        except Exception as e:
+            logger.warning(f"Failed to read cached preferences for {username}: {e}")
+
+        # Get user preferences from database. settings is fetched as jsonb
+        # text and spliced into the response as-is, skipping the
+        # parse + re-encode round trip through Python objects.
         result = db("""
-            SELECT theme, avatar_seed, settings
+            SELECT theme, avatar_seed, settings::text
             FROM user_preferences
             WHERE username = %s
         """, (username,))
 
         if result and result[0]:
+            settings = result[0][2]
             prefs = {
                 'theme': result[0][0],
                 'avatar_seed': result[0][1],
-                'settings': result[0][2]
+                'settings': orjson.Fragment(settings) if settings is not None else None
             }
-            logger.debug(f"Retrieved preferences for {username}: {prefs}")
-            return jsonify(prefs), 200
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Retrieved preferences for {username}: theme={prefs['theme']}, settings={settings}")
+            body = orjson.dumps(prefs)
+            cache_preferences(username, body)
+            store_user_avatar(prefs['avatar_seed'], username)
+            return Response(body, mimetype='application/json'), 200
 
-        # If no preferences exist yet, return defaults
+        # If no preferences exist yet, return defaults. These are not cached:
+        # the row is created at first login, which does not touch the cache.
         logger.debug(f"No preferences found for {username}, returning defaults")
-        return jsonify({
+        return json_response({
             'theme': 'dark',
             'avatar_seed': None,
             'settings': {}
         }), 200
 
     except Exception as e:
-        logger.error(f"Error getting preferences for user {get_jwt_identity()}: {e}")
-        logger.error(traceback.format_exc())
-        return jsonify({"error": "Failed to get preferences"}), 500
+        logger.exception(f"Error getting preferences for user {get_jwt_identity()}: {e}")
+        return json_response({"error": "Failed to get preferences"}), 500
+
+# Upsert that skips the write when nothing changed; RETURNING then yields
+# no row. Errors raise from db_prepared rather than returning None.
+_UPSERT_PREFS = """
+    INSERT INTO user_preferences (username, theme, avatar_seed, settings)
+    VALUES ($1, $2, $3, $4::jsonb)
+    ON CONFLICT (username)
+    DO UPDATE SET
+        theme = EXCLUDED.theme,
+        avatar_seed = EXCLUDED.avatar_seed,
+        settings = EXCLUDED.settings
+    WHERE user_preferences.theme IS DISTINCT FROM EXCLUDED.theme
+       OR user_preferences.avatar_seed IS DISTINCT FROM EXCLUDED.avatar_seed
+       OR user_preferences.settings IS DISTINCT FROM EXCLUDED.settings
+    RETURNING theme, avatar_seed
+"""
 
 @preferences_bp.route('/api/v1/preferences', methods=['POST'])
 @jwt_required()
@@ -160,61 +266,86 @@ def update_preferences():
         username = get_jwt_identity()
         logger.info(f"Updating preferences for user: {username}")
 
-        data = request.get_json()
-        logger.debug(f"Received preference data: {data}")
+        try:
+            data = orjson.loads(request.get_data() or b'null')
+        except orjson.JSONDecodeError:
+            return json_response({"error": "Invalid JSON data"}), 400
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received preference data: {data}")
 
         if not data:
             logger.warning("No preference data provided")
-            return jsonify({"error": "No data provided"}), 400
+            return json_response({"error": "No data provided"}), 400
 
         theme = data.get('theme', 'dark')
         avatar_seed = data.get('avatar_seed')
-        settings = json.dumps(data.get('settings', {}))  # Convert dict to JSON string
+        settings = orjson.dumps(data.get('settings', {})).decode()  # Convert dict to JSON string
 
         # Validate theme
         if theme not in ['dark', 'light']:
             logger.warning(f"Invalid theme value: {theme}")
-            return jsonify({"error": "Invalid theme value"}), 400
+            return json_response({"error": "Invalid theme value"}), 400
 
-        # Update or insert preferences using the db function
-        result = db("""
-            INSERT INTO user_preferences (username, theme, avatar_seed, settings)
-            VALUES (%s, %s, %s, %s::jsonb)
-            ON CONFLICT (username) 
-            DO UPDATE SET 
-                theme = EXCLUDED.theme,
-                avatar_seed = EXCLUDED.avatar_seed,
-                settings = EXCLUDED.settings
-            RETURNING username, theme, avatar_seed
-        """, (username, theme, avatar_seed, settings))
+        # One prepared upsert; rows that would not change are left alone
+        result = db_prepared('upsert_prefs', _UPSERT_PREFS, (username, theme, avatar_seed, settings), commit=True)
 
         if result:
             logger.info(f"Successfully updated preferences for user: {username}")
-            return jsonify({"message": "Preferences updated successfully"}), 200
         else:
-            logger.error(f"Failed to update preferences for user: {username}")
-            return jsonify({"error": "Failed to update preferences"}), 500
+            logger.info(f"Preferences unchanged for user: {username}")
+
+        store_user_avatar(avatar_seed, username)
+
+        # Write through, so the next read does not go to the database
+        cache_preferences(username, orjson.dumps({
+            'theme': theme,
+            'avatar_seed': avatar_seed,
+            'settings': orjson.Fragment(settings)
+        }))
+        return json_response({"message": "Preferences updated successfully"}), 200
 
     except Exception as e:
-        logger.error(f"Error updating preferences for user {get_jwt_identity()}: {e}")
-        logger.error(traceback.format_exc())
-        return jsonify({"error": "Failed to update preferences"}), 500
+        logger.exception(f"Error updating preferences for user {get_jwt_identity()}: {e}")
+        return json_response({"error": "Failed to update preferences"}), 500
+
+# Avatars never change for a given seed and initial
+AVATAR_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Fixed Last-Modified for every avatar, so caches can revalidate with
+# If-Modified-Since as well as the ETag. Move it forward whenever the
+# output of generate_avatar_svg changes.
+AVATAR_LAST_MODIFIED = datetime(2024, 12, 11, tzinfo=timezone.utc)
 
 @preferences_bp.route('/api/v1/avatar/<int:seed>', methods=['GET'])
-def get_avatar(seed):
-    """Get avatar image based on seed value"""
+@preferences_bp.route('/api/v1/avatar/<int:seed>/<initial>', methods=['GET'])
+def get_avatar(seed, initial=None):
+    """Get avatar image based on seed value
+
+    The initial is taken from the path when given, so the URL alone is the
+    cache key; the ?username= form is still accepted.
+    """
     try:
-        # Get username from request args or default to 'U'
-        username = request.args.get('username', 'U')
-        initial = username[0].upper()
+        if initial is None:
+            # Get username from request args or default to 'U'
+            initial = request.args.get('username', 'U')
+        initial = initial[0].upper()
 
-        # Generate SVG avatar
-        svg_content = generate_avatar_svg(seed, initial)
+        # The SVG is a pure function of seed and initial, so the pair makes a
+        # strong ETag; the initial goes in as a code point to stay ASCII
+        etag = f"{seed}-{ord(initial):x}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            # Generate SVG avatar
+            response = Response(render_avatar(seed, initial), mimetype='image/svg+xml')
 
-        # Return SVG with proper content type
-        return Response(svg_content, mimetype='image/svg+xml')
+        # Browsers and any proxy in front of the API can keep it for good
+        response.set_etag(etag)
+        response.last_modified = AVATAR_LAST_MODIFIED
+        response.headers['Cache-Control'] = AVATAR_CACHE_CONTROL
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Answers If-Modified-Since for requests that carry no matching ETag
+        return response.make_conditional(request)
 
     except Exception as e:
-        logger.error(f"Error generating avatar: {e}")
-        logger.error(traceback.format_exc())
-        return jsonify({"error": "Failed to generate avatar"}), 500 
\ No newline at end of file
+        logger.exception(f"Error generating avatar: {e}")
+        return json_response({"error": "Failed to generate avatar"}), 500 
\ No newline at end of file
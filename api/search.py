@@ -5,13 +5,13 @@ PATH: api/search.py
 from datetime import datetime
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from typing import List
-import re
+from typing import Dict, List, Tuple
+from ipaddress import IPv4Address
 import time
 
 # Import shared resources
 from simpleLogger import SimpleLogger
-from core import db, rate_limit
+from core import db, db_stream_started, rate_limit
 
 # Initialize logger
 logger = SimpleLogger('search')
@@ -19,82 +19,69 @@ logger = SimpleLogger('search')
 # Create blueprint
 search_bp = Blueprint('search', __name__)
 
+# Rows seeded into the empty test location tables: (subnet, sensor, device)
+TEST_SUBNETS = {
+    'src': [
+        ('192.168.1.0/24', 'test_sensor1', 'napa0'),  # For test case 1
+        ('172.16.0.0/24', 'test_sensor2', 'napa0'),   # For test case 3
+        ('10.0.0.0/24', 'test_sensor3', 'napa1')      # For test case 4
+    ],
+    'dst': [
+        ('10.1.0.0/24', 'test_sensor1', 'napa0'),     # For test case 2
+        ('192.168.2.0/24', 'test_sensor2', 'napa0'),  # For test case 3
+        ('172.16.1.0/24', 'test_sensor3', 'napa1')    # For test case 4
+    ]
+}
+
 def ensure_test_tables_exist():
-    """Ensure test location tables exist"""
+    """Ensure test location tables exist
+
+    Each table is created and, if it is empty, seeded in one statement
+    batch; a single query then checks both tables have rows.
+    """
     try:
-        for table_type in ['src', 'dst']:
-            # Create table if it doesn't exist
-            db(f"""CREATE TABLE IF NOT EXISTS loc_{table_type}_test (
-                subnet cidr PRIMARY KEY,
-                count bigint NOT NULL DEFAULT 0,
-                first_seen bigint,
-                last_seen bigint,
-                sensor varchar(255),
-                device varchar(255)
-            )""")
-
-            # Check if table exists and has data
-            table_exists = db("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables
-                    WHERE table_name = %s
-                    AND table_schema = 'public'
-                )
-            """, (f'loc_{table_type}_test',))[0][0]
-
-            if not table_exists:
-                logger.error(f"Failed to create table loc_{table_type}_test")
+        # Insert test data with UNIX timestamps
+        current_time = int(time.time())
+
+        for table_type, test_subnets in TEST_SUBNETS.items():
+            table = f'loc_{table_type}_test'
+            values = ", ".join(["(%s, 100, %s, %s, %s, %s)"] * len(test_subnets))
+            params = []
+            for subnet, sensor, device in test_subnets:
+                params.extend((subnet, current_time - 3600, current_time, sensor, device))
+
+            try:
+                db(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        subnet cidr PRIMARY KEY,
+                        count bigint NOT NULL DEFAULT 0,
+                        first_seen bigint,
+                        last_seen bigint,
+                        sensor varchar(255),
+                        device varchar(255)
+                    );
+                    INSERT INTO {table}
+                    (subnet, count, first_seen, last_seen, sensor, device)
+                    SELECT v.subnet::cidr, v.count, v.first_seen, v.last_seen, v.sensor, v.device
+                    FROM (VALUES {values}) AS v(subnet, count, first_seen, last_seen, sensor, device)
+                    WHERE NOT EXISTS (SELECT 1 FROM {table})
+                    ON CONFLICT (subnet) DO UPDATE
+                    SET count = {table}.count + 100,
+                        last_seen = EXCLUDED.last_seen;
+                """, params)
+            except Exception as e:
+                logger.error(f"Error inserting test data for {table_type}: {str(e)}")
                 return False
 
-            # Check if table is empty
-            count = db(f"SELECT COUNT(*) FROM loc_{table_type}_test")[0][0]
+        # Verify both tables exist and hold data
+        counts = db("""
+            SELECT (SELECT COUNT(*) FROM loc_src_test),
+                   (SELECT COUNT(*) FROM loc_dst_test)
+        """)[0]
+        for table_type, count in zip(TEST_SUBNETS, counts):
             if count == 0:
-                # Insert test data with UNIX timestamps
-                current_time = int(time.time())
-
-                # Use test data from config
-                if table_type == 'src':
-                    test_subnets = [
-                        ('192.168.1.0/24', 'test_sensor1', 'napa0'),  # For test case 1
-                        ('172.16.0.0/24', 'test_sensor2', 'napa0'),   # For test case 3
-                        ('10.0.0.0/24', 'test_sensor3', 'napa1')      # For test case 4
-                    ]
-                else:
-                    test_subnets = [
-                        ('10.1.0.0/24', 'test_sensor1', 'napa0'),     # For test case 2
-                        ('192.168.2.0/24', 'test_sensor2', 'napa0'),  # For test case 3
-                        ('172.16.1.0/24', 'test_sensor3', 'napa1')    # For test case 4
-                    ]
-
-                try:
-                    for subnet, sensor, device in test_subnets:
-                        # Insert test data with transaction
-                        db(f"""
-                            BEGIN;
-                            INSERT INTO loc_{table_type}_test
-                            (subnet, count, first_seen, last_seen, sensor, device)
-                            VALUES
-                            (%s, 100, %s, %s, %s, %s)
-                            ON CONFLICT (subnet) DO UPDATE
-                            SET count = loc_{table_type}_test.count + 100,
-                                last_seen = EXCLUDED.last_seen;
-                            COMMIT;
-                        """, (subnet, current_time - 3600, current_time, sensor, device))
-
-                        # Verify data was inserted
-                        verify = db(f"""
-                            SELECT COUNT(*)
-                            FROM loc_{table_type}_test
-                            WHERE subnet = %s::cidr
-                        """, (subnet,))[0][0]
-
-                        if verify == 0:
-                            logger.error(f"Failed to verify test data for {table_type} subnet {subnet}")
-                            return False
-
-                except Exception as e:
-                    logger.error(f"Error inserting test data for {table_type}: {str(e)}")
-                    return False
+                logger.error(f"Failed to verify test data for loc_{table_type}_test")
+                return False
 
         return True
 
@@ -102,22 +89,62 @@ def ensure_test_tables_exist():
         logger.error(f"Error ensuring test tables exist: {str(e)}")
         return False
 
+# Rows fetched per round trip when streaming single-IP search results
+SEARCH_ITERSIZE = 1000
+
+# Seconds a location table listing is reused. Tables only appear or go
+# away when sensors are added or removed, which invalidates this early.
+LOCATION_TABLES_TTL = 60
+_location_tables_cache: Dict[str, Tuple[float, List[str]]] = {}
+
 def get_location_tables(search_type='src') -> List[str]:
-    """Get list of location tables for a search type"""
+    """Get list of location tables for a search type, cached for LOCATION_TABLES_TTL"""
+    now = time.monotonic()
+    cached = _location_tables_cache.get(search_type)
+    if cached and now - cached[0] < LOCATION_TABLES_TTL:
+        return cached[1]
+
     rows = db("""
         SELECT table_name
         FROM information_schema.tables
         WHERE table_name LIKE %s
         AND table_schema = 'public'
     """, (f'loc_{search_type}_%',))
-    return [row[0] for row in rows]
+    tables = [row[0] for row in rows]
+    _location_tables_cache[search_type] = (now, tables)
+    return tables
+
+def invalidate_location_tables():
+    """Drop the cached table listings after location tables are created or dropped"""
+    _location_tables_cache.clear()
+
+def _search_separately(parts, label):
+    """Run the parts of a failed UNION ALL search one at a time
+
+    parts is a list of (location, sql, params). A location whose query also
+    fails is logged and skipped, so one bad table (say, dropped since the
+    table listing was cached) costs only its own rows rather than the whole
+    search.
+    """
+    rows = []
+    for loc, sql, params in parts:
+        loc_rows = db(sql, params, max_retries=1)
+        if loc_rows is None:
+            logger.error(f"Error searching {label} for location {loc}, skipping it")
+            continue
+        rows.extend(loc_rows)
+    return rows
 
 def is_valid_ip(ip):
-    """Validate IP address format"""
-    pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if not re.match(pattern, ip):
+    """Validate IPv4 address format"""
+    # IPv4Address also takes ints, but only dotted-quad strings are valid here
+    if not isinstance(ip, str):
+        return False
+    try:
+        IPv4Address(ip)
+        return True
+    except ValueError:
         return False
-    return all(0 <= int(part) <= 255 for part in ip.split('.'))
 
 @search_bp.route('/api/v1/search/ip', methods=['POST'])
 @jwt_required()
@@ -161,129 +188,139 @@ def search_ip():
         sensor_confidences = {}  # Track confidence per sensor
 
         if src_ip and dst_ip:
-            # Search for source-destination pairs
-            for loc in set(t.replace('loc_src_', '') for t in src_tables):
-                src_matches = []
-                dst_matches = []
+            # Search for source-destination pairs. Postgres joins each
+            # location's src and dst matches on sensor and device, and one
+            # UNION ALL covers every location that has both tables.
+            dst_table_set = set(dst_tables)
+            locations = sorted(loc for loc in (t.removeprefix('loc_src_') for t in src_tables)
+                               if f'loc_dst_{loc}' in dst_table_set)
+            rows = []
+            if locations:
+                parts = [(loc, f"""
+                    SELECT %s AS location, s.sensor, s.device,
+                           s.subnet, s.count, s.first_seen, s.last_seen,
+                           d.subnet, d.count, d.first_seen, d.last_seen
+                    FROM "loc_src_{loc}" s
+                    JOIN "loc_dst_{loc}" d ON d.sensor = s.sensor AND d.device = s.device
+                    WHERE s.subnet >>= %s::inet
+                    AND d.subnet >>= %s::inet
+                """, (loc, src_ip, dst_ip)) for loc in locations]
+                query = " UNION ALL ".join(sql for _, sql, _ in parts)
+                params = [p for _, _, loc_params in parts for p in loc_params]
+
+                # db() returns None once its retries are spent. The fallback
+                # below retries per location, so one attempt is enough here.
+                rows = db(query, params, max_retries=1)
+                if rows is None:
+                    logger.error("Error searching location table pairs, searching each location separately")
+                    invalidate_location_tables()
+                    rows = _search_separately(parts, "location table pair")
+
+            for loc, sensor_name, device, *pair in rows:
+                src, dst = pair[:4], pair[4:]
+                match = {
+                    'location': loc,
+                    'sensor': sensor_name,
+                    'device': device,
+                    'src_subnet': str(src[0]),
+                    'dst_subnet': str(dst[0]),
+                    'src_count': src[1],
+                    'dst_count': dst[1],
+                    'src_first_seen': src[2],
+                    'src_last_seen': src[3],
+                    'dst_first_seen': dst[2],
+                    'dst_last_seen': dst[3]
+                }
 
-                # Search source table for this location
-                src_table = f'loc_src_{loc}'
-                try:
-                    src_rows = db(f"""
-                        SELECT subnet, count, first_seen, last_seen, sensor, device
-                        FROM {src_table}
-                        WHERE subnet >>= %s::inet
-                    """, (src_ip,))
-                    src_matches.extend(src_rows)
-                except Exception as e:
-                    logger.error(f"Error searching {src_table}: {e}")
-                    continue
+                # Calculate confidence for this sensor
+                if start_ts or end_ts:
+                    src_in_range = (not start_ts or src[2] <= start_ts) and (not end_ts or src[3] >= end_ts)
+                    dst_in_range = (not start_ts or dst[2] <= start_ts) and (not end_ts or dst[3] >= end_ts)
 
-                # Search destination table for this location
-                dst_table = f'loc_dst_{loc}'
-                try:
-                    dst_rows = db(f"""
-                        SELECT subnet, count, first_seen, last_seen, sensor, device
-                        FROM {dst_table}
-                        WHERE subnet >>= %s::inet
-                    """, (dst_ip,))
-                    dst_matches.extend(dst_rows)
-                except Exception as e:
-                    logger.error(f"Error searching {dst_table}: {e}")
-                    continue
-
-                # Find matching sensor/device pairs in this location
-                for src in src_matches:
-                    for dst in dst_matches:
-                        if src[4] == dst[4] and src[5] == dst[5]:  # Same sensor and device
-                            sensor_name = src[4]
-                            match = {
-                                'location': loc,
-                                'sensor': sensor_name,
-                                'device': src[5],
-                                'src_subnet': str(src[0]),
-                                'dst_subnet': str(dst[0]),
-                                'src_count': src[1],
-                                'dst_count': dst[1],
-                                'src_first_seen': src[2],
-                                'src_last_seen': src[3],
-                                'dst_first_seen': dst[2],
-                                'dst_last_seen': dst[3]
-                            }
+                    if src_in_range and dst_in_range:
+                        sensor_confidences[sensor_name] = {
+                            "level": "high",
+                            "reason": "Data spans entire timeframe"
+                        }
+                    else:
+                        sensor_confidences[sensor_name] = {
+                            "level": "low",
+                            "reason": "Data does not span entire timeframe"
+                        }
+                else:
+                    sensor_confidences[sensor_name] = {
+                        "level": "high",
+                        "reason": "No timeframe specified"
+                    }
 
-                            # Calculate confidence for this sensor
-                            if start_ts or end_ts:
-                                src_in_range = (not start_ts or src[2] <= start_ts) and (not end_ts or src[3] >= end_ts)
-                                dst_in_range = (not start_ts or dst[2] <= start_ts) and (not end_ts or dst[3] >= end_ts)
-
-                                if src_in_range and dst_in_range:
-                                    sensor_confidences[sensor_name] = {
-                                        "level": "high",
-                                        "reason": "Data spans entire timeframe"
-                                    }
-                                else:
-                                    sensor_confidences[sensor_name] = {
-                                        "level": "low",
-                                        "reason": "Data does not span entire timeframe"
-                                    }
-                            else:
-                                sensor_confidences[sensor_name] = {
-                                    "level": "high",
-                                    "reason": "No timeframe specified"
-                                }
-
-                            results.append(match)
+                results.append(match)
 
         else:
             # Single IP search
             tables = src_tables if src_ip else dst_tables
             search_ip = src_ip if src_ip else dst_ip
-
-            for table in tables:
-                loc = table.replace('loc_src_', '').replace('loc_dst_', '')
-                quoted_table = f'"{table}"'
+            prefix = 'loc_src_' if src_ip else 'loc_dst_'
+
+            # One UNION ALL across every location table, tagged with its
+            # location, instead of a round trip per table. Rows are streamed
+            # from a server-side cursor rather than fetched as one list, so a
+            # broad subnet match never sits in memory as raw rows and match
+            # dicts at the same time.
+            rows = ()
+            if tables:
+                parts = [(table.removeprefix(prefix), f"""
+                    SELECT %s AS location, subnet, count, first_seen, last_seen, sensor, device
+                    FROM "{table}"
+                    WHERE subnet >>= %s::inet
+                """, (table.removeprefix(prefix), search_ip)) for table in tables]
+                query = " UNION ALL ".join(sql for _, sql, _ in parts)
+                params = [p for _, _, loc_params in parts for p in loc_params]
+
+                # The first row is fetched here, so a failing union is
+                # caught before any rows are consumed and each table can
+                # be searched on its own instead
                 try:
-                    rows = db(f"""
-                        SELECT subnet, count, first_seen, last_seen, sensor, device
-                        FROM {quoted_table}
-                        WHERE subnet >>= %s::inet
-                    """, (search_ip,))
-
-                    for row in rows:
-                        sensor_name = row[4]
-                        match = {
-                            'location': loc,
-                            'sensor': sensor_name,
-                            'device': row[5],
-                            'subnet': str(row[0]),
-                            'count': row[1],
-                            'first_seen': row[2],
-                            'last_seen': row[3]
-                        }
-
-                        # Calculate confidence for this sensor
-                        if start_ts or end_ts:
-                            in_range = (not start_ts or row[2] <= start_ts) and (not end_ts or row[3] >= end_ts)
-                            if in_range:
-                                sensor_confidences[sensor_name] = {
-                                    "level": "high",
-                                    "reason": "Data spans entire timeframe"
-                                }
-                            else:
-                                sensor_confidences[sensor_name] = {
-                                    "level": "low",
-                                    "reason": "Data does not span entire timeframe"
-                                }
-                        else:
+                    rows = db_stream_started(query, params, itersize=SEARCH_ITERSIZE)
+                except Exception as e:
+                    logger.error(f"Error searching location tables, searching each table separately: {e}")
+                    invalidate_location_tables()
+                    rows = _search_separately(parts, "location table")
+
+            try:
+                for loc, *row in rows:
+                    sensor_name = row[4]
+                    match = {
+                        'location': loc,
+                        'sensor': sensor_name,
+                        'device': row[5],
+                        'subnet': str(row[0]),
+                        'count': row[1],
+                        'first_seen': row[2],
+                        'last_seen': row[3]
+                    }
+
+                    # Calculate confidence for this sensor
+                    if start_ts or end_ts:
+                        in_range = (not start_ts or row[2] <= start_ts) and (not end_ts or row[3] >= end_ts)
+                        if in_range:
                             sensor_confidences[sensor_name] = {
                                 "level": "high",
-                                "reason": "No timeframe specified"
+                                "reason": "Data spans entire timeframe"
+                            }
+                        else:
+                            sensor_confidences[sensor_name] = {
+                                "level": "low",
+                                "reason": "Data does not span entire timeframe"
                             }
+                    else:
+                        sensor_confidences[sensor_name] = {
+                            "level": "high",
+                            "reason": "No timeframe specified"
+                        }
 
-                        results.append(match)
-                except Exception as e:
-                    logger.error(f"Error searching {table}: {e}")
-                    continue
+                    results.append(match)
+            except Exception as e:
+                logger.error(f"Error searching location tables: {e}")
 
         # Calculate overall confidence
         if not results:
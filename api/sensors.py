@@ -4,7 +4,7 @@ PATH: api/sensors.py
 """
 from flask import Blueprint, jsonify, request, Response
 from flask_jwt_extended import jwt_required, get_jwt
-import re
+from ipaddress import IPv4Address
 from typing import List
 import json
 import traceback
@@ -12,6 +12,8 @@ from datetime import datetime, timezone
 
 from core import logger, db, rate_limit, db_pool, config
 from api.auth import admin_required, activity_tracking
+from api.location_manager import location_manager
+from api.search import invalidate_location_tables
 from cache_utils import redis_client, get_cache_key
 
 sensors_bp = Blueprint('sensors', __name__)
@@ -107,6 +109,7 @@ def initialize_sensors_from_config():
                         logger.debug(traceback.format_exc())
                         continue
                 conn.commit()
+            invalidate_location_tables()
         finally:
             db_pool.putconn(conn)
 
@@ -425,11 +428,15 @@ def get_location_tables(cur, search_type='src') -> List[str]:
     return [row[0] for row in cur.fetchall()]
 
 def is_valid_ip(ip):
-    """Validate IP address format"""
-    pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if not re.match(pattern, ip):
+    """Validate IPv4 address format"""
+    # IPv4Address also takes ints, but only dotted-quad strings are valid here
+    if not isinstance(ip, str):
+        return False
+    try:
+        IPv4Address(ip)
+        return True
+    except ValueError:
         return False
-    return all(0 <= int(part) <= 255 for part in ip.split('.'))
 
 @sensors_bp.route('/api/v1/sensors', methods=['GET'])
 @jwt_required()
@@ -663,6 +670,7 @@ def add_sensor():
                 with conn.cursor() as cur:
                     create_location_tables(cur, location)
                 conn.commit()
+                invalidate_location_tables()
                 logger.info(f"Created location tables for {location}")
             except Exception as e:
                 logger.error(f"Error creating location tables: {e}")
@@ -676,6 +684,7 @@ def add_sensor():
             (name, fqdn, status, location)
             VALUES (%s, %s, 'Online', %s)
         """, (name, fqdn, location))
+        location_manager.invalidate_sensors(location)
 
         # Add initial status history entry for each device
         for device_name, device_config in device_configs.items():
@@ -783,6 +792,9 @@ def delete_sensor(sensor_name):
 
                 # Commit transaction
                 conn.commit()
+                location_manager.invalidate_sensors(location)
+                if remaining_sensors == 0:
+                    invalidate_location_tables()
 
                 logger.info(f"Successfully deleted sensor '{sensor_name}' and {device_count} devices")
                 return jsonify({
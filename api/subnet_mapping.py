@@ -287,15 +287,17 @@ def get_subnet_mappings():
                     earliest_seen,
                     latest_seen
                 FROM network_traffic_summary
-                WHERE 1=1
             """
+            conditions = []
             params = []
             if src_loc_canonical:
-                query += " AND src_location = %s"
+                conditions.append("src_location = %s")
                 params.append(src_loc_canonical)
             if dst_loc_canonical:
-                query += " AND dst_location = %s"
+                conditions.append("dst_location = %s")
                 params.append(dst_loc_canonical)
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
 
             rows = db(query, params)
             mappings = [{
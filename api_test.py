@@ -206,7 +206,7 @@ class ApiTester:
         result = self.run_test("Get all subnet location counts", "GET", "/api/v1/subnet-location-counts")
 
         if result and result['success'] and result['response']:
-            counts = result['response']
+            counts = result['response'].get('counts', [])
             if len(counts) > 0:
                 # Get the first mapping for subsequent tests
                 first_mapping = counts[0]
@@ -1,7 +1,9 @@
 import redis
 import configparser
 import logging
+import threading
 import traceback
+import zstandard
 from typing import List, Optional
 
 # Setup logging
@@ -11,14 +13,44 @@ logger = logging.getLogger(__name__)
 config = configparser.ConfigParser()
 config.read('/opt/pcapserver/config.ini')
 
-# Initialize Redis client
-redis_client = redis.Redis(
+# Initialize Redis client. Every blueprint shares this one pool; idle
+# connections are kept alive and health-checked so a burst of requests
+# reuses open sockets instead of reconnecting.
+redis_pool = redis.ConnectionPool(
     host=config.get('REDIS', 'host'),
     port=config.getint('REDIS', 'port'),
     db=config.getint('REDIS', 'db'),
     socket_timeout=config.getint('REDIS', 'sock_timeout'),
-    socket_connect_timeout=config.getint('REDIS', 'sock_connect_timeout')
+    socket_connect_timeout=config.getint('REDIS', 'sock_connect_timeout'),
+    socket_keepalive=True,
+    health_check_interval=30,
+    max_connections=config.getint('REDIS', 'max_connections', fallback=64)
 )
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# Leading byte of a compressed cache value, naming its codec so the format
+# can change later. Values without it are treated as cache misses.
+ZSTD_TAG = b'\x01'
+ZSTD_LEVEL = 3
+
+# zstandard contexts must not be shared between threads
+_zstd = threading.local()
+
+def compress_value(data: bytes) -> bytes:
+    """Compress an encoded payload for storage in Redis"""
+    cctx = getattr(_zstd, 'cctx', None)
+    if cctx is None:
+        cctx = _zstd.cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return ZSTD_TAG + cctx.compress(data)
+
+def decompress_value(value: Optional[bytes]) -> Optional[bytes]:
+    """Undo compress_value; None for a missing or unrecognised value"""
+    if not value or value[:1] != ZSTD_TAG:
+        return None
+    dctx = getattr(_zstd, 'dctx', None)
+    if dctx is None:
+        dctx = _zstd.dctx = zstandard.ZstdDecompressor()
+    return dctx.decompress(value[1:])
 
 # Cache key constants
 CACHE_KEYS = {
@@ -2,20 +2,27 @@
 Core shared resources for the PCAP Server API
 """
 from functools import wraps
-from flask import jsonify, request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from flask import jsonify, request, Response, stream_with_context, g, has_request_context
 import redis
 import time
 import configparser
+import logging
 import os
-from psycopg2.pool import SimpleConnectionPool
+import itertools
+import weakref
+from psycopg2.pool import ThreadedConnectionPool
 from simpleLogger import SimpleLogger
 from datetime import datetime, timezone, timedelta
 import pytz
 from dateutil import parser
 import hmac
 import hashlib
+from uuid import uuid4
 import urllib.parse
 import json
+import orjson
 from typing import Dict, Any, List
 from decimal import Decimal
 
@@ -34,6 +41,14 @@ server_status = {
     'state': 'running'
 }
 
+@dataclass(frozen=True, slots=True)
+class Paths:
+    """Filesystem locations resolved once from config at startup"""
+    jobs: str       # Merged job pcap directory
+    tasks: str      # Per-sensor task pcap directory
+    job_pcap: str   # Template for a merged job pcap, format(job_id)
+    task_pcap: str  # Template for a task pcap, format(job_id, task_id)
+
 # Load and validate configuration
 config = configparser.ConfigParser()
 config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
@@ -55,20 +70,27 @@ try:
         raise configparser.Error(f"Missing required sections: {', '.join(missing_sections)}")
 
     # Load and validate critical values
-    JOBS_PATH = os.path.abspath(os.path.join(
+    jobs_path = os.path.abspath(os.path.join(
         os.path.dirname(__file__),
         config.get('DOWNLOADS', 'jobs_path')
     ))
     # Ensure directory exists
-    os.makedirs(JOBS_PATH, exist_ok=True)
+    os.makedirs(jobs_path, exist_ok=True)
 
-    TASKS_PATH = os.path.abspath(os.path.join(
+    tasks_path = os.path.abspath(os.path.join(
         os.path.dirname(__file__),
         config.get('DOWNLOADS', 'tasks_path')
     ))
 
     # Ensure directory exists
-    os.makedirs(JOBS_PATH, exist_ok=True)
+    os.makedirs(tasks_path, exist_ok=True)
+
+    PATHS = Paths(
+        jobs=jobs_path,
+        tasks=tasks_path,
+        job_pcap=jobs_path + os.sep + "{}.pcap",        # job_id
+        task_pcap=tasks_path + os.sep + "{}_{}.pcap"    # job_id, task_id
+    )
 
     URL_EXPIRATION = 21600  # 6 hours in seconds
     URL_SECRET = config.get('SERVER', 'secret_key')
@@ -85,8 +107,8 @@ try:
     }
     if not all(db_config.values()): raise ValueError("Invalid database configuration")
 
-    # Initialize database pool
-    db_pool = SimpleConnectionPool(
+    # Initialize database pool (thread-safe, shared by all request threads)
+    db_pool = ThreadedConnectionPool(
         db_config['min'],
         db_config['max'],
         host=db_config['host'],
@@ -160,30 +182,85 @@ def rate_limit():
         return decorated_function
     return decorator
 
-def db(sql, params=None, max_retries=3):
-    """Execute database query using connection pool"""
-    conn = None
+@contextmanager
+def request_conn():
+    """Pin one pooled connection for the db() calls made inside the block
+
+    Use it (as a with block or a view decorator) around request code that
+    runs several statements back to back, so they share one checkout.
+    Everything else takes a connection per call and returns it straight
+    away, so a request never holds a pool slot while it does other work or
+    streams its response. Nested blocks share the outer pin.
+    """
+    if g.get('db_pin'):
+        yield
+        return
+    g.db_pin = True
+    try:
+        yield
+    finally:
+        g.pop('db_pin', None)
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            # putconn() rolls back anything still open, such as the
+            # implicit transaction left behind by a trailing SELECT
+            db_pool.putconn(conn, close=bool(conn.closed))
+
+def _acquire_conn():
+    """Get a pooled connection, the pinned one inside a request_conn() block
+
+    Returns (conn, pinned).
+    """
+    if not (has_request_context() and g.get('db_pin')):
+        return db_pool.getconn(), False
+    conn = g.get('db_conn')
+    if conn is None:
+        conn = g.db_conn = db_pool.getconn()
+    return conn, True
+
+def _release_conn(conn, pinned, failed=False):
+    """Return a connection from _acquire_conn to the pool when it is done"""
+    if pinned and not failed:
+        return  # Released when the request_conn() block exits
+    if pinned:
+        # Unpin so a retry starts on a clean connection
+        g.pop('db_conn', None)
+    db_pool.putconn(conn, close=bool(conn.closed))
+
+def db(sql, params=None, max_retries=3, cursor_factory=None):
+    """Execute database query using connection pool
+
+    cursor_factory is passed through to conn.cursor(), e.g. RealDictCursor
+    to get rows back as dicts keyed by column name.
+    """
     results = None
     for attempt in range(max_retries):
+        conn = None
+        failed = False
         try:
-            conn = db_pool.getconn()
-            with conn.cursor() as cur:
-                expanded_sql = cur.mogrify(sql, params).decode('utf-8')
-                logger.debug(f'DB: EXECUTING EXPANDED SQL: {expanded_sql}')
+            conn, pinned = _acquire_conn()
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                # mogrify and result formatting are only worth paying for
+                # when debug output is actually going to be written
+                debug = logger.isEnabledFor(logging.DEBUG)
+                if debug:
+                    expanded_sql = cur.mogrify(sql, params).decode('utf-8')
+                    logger.debug(f'DB: EXECUTING EXPANDED SQL: {expanded_sql}')
 
                 cur.execute(sql, params)
                 if sql.strip().upper().startswith('SELECT'):
                     results = cur.fetchall()
-                    logger.debug(f'DB: RESULTS={results}')
+                    if debug: logger.debug(f'DB: RESULTS={results}')
                 elif 'RETURNING' in sql.upper():
                     results = cur.fetchone()
-                    logger.debug(f'DB: RETURNING={results}')
+                    if debug: logger.debug(f'DB: RETURNING={results}')
                     conn.commit()
                 else:
                     conn.commit()
-                    logger.debug(f'DB: COMMITTED')
+                    logger.debug('DB: COMMITTED')
                 break
         except Exception as e:
+            failed = True
             if attempt >= max_retries:
                 logger.error(f"DB ERROR: {e}")
                 raise
@@ -191,9 +268,84 @@ def db(sql, params=None, max_retries=3):
             logger.warning(f"DB RETRY {attempt}/{max_retries} AFTER: {e}")
             time.sleep(1)
         finally:
-            if conn: db_pool.putconn(conn)
+            if conn: _release_conn(conn, pinned, failed)
     return results
 
+# Statement names PREPAREd on each pooled connection. Prepared statements
+# last for the server session, so a connection prepares each name once;
+# entries go away with their connection.
+_prepared_statements = weakref.WeakKeyDictionary()
+
+def db_prepared(name, sql, params=(), cursor_factory=None, commit=False):
+    """Run a fixed statement as a named prepared statement and return all rows
+
+    sql uses $1, $2, ... placeholders. The first call on a connection
+    PREPAREs it; every call EXECUTEs it with params, so Postgres parses and
+    plans the query once per connection instead of once per request.
+    Writes pass commit=True and should use RETURNING to get rows back.
+    """
+    conn, pinned = _acquire_conn()
+    failed = False
+    try:
+        with conn.cursor(cursor_factory=cursor_factory) as cur:
+            prepared = _prepared_statements.setdefault(conn, set())
+            if name not in prepared:
+                cur.execute(f"PREPARE {name} AS {sql}")
+                prepared.add(name)
+            if params:
+                cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            else:
+                cur.execute(f"EXECUTE {name}")
+            results = cur.fetchall()
+        if commit:
+            conn.commit()
+        return results
+    except Exception:
+        failed = True
+        raise
+    finally:
+        _release_conn(conn, pinned, failed)
+
+def db_stream(sql, params=None, itersize=64, cursor_factory=None):
+    """Yield rows for a SELECT from a server-side cursor
+
+    Rows are fetched from Postgres itersize at a time, so large result sets
+    are never fully materialized in the worker. The pooled connection is held
+    until the generator is exhausted or closed.
+    """
+    conn = db_pool.getconn()
+    try:
+        with conn.cursor(name='db_stream', cursor_factory=cursor_factory) as cur:
+            cur.itersize = itersize
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
+    finally:
+        # Read-only: end the cursor's transaction before returning the connection.
+        # If the server dropped the connection the rollback fails too; close
+        # it rather than leaking its pool slot.
+        try:
+            conn.rollback()
+        except Exception as e:
+            logger.warning(f"DB: rollback after stream failed: {e}")
+            db_pool.putconn(conn, close=True)
+        else:
+            db_pool.putconn(conn, close=bool(conn.closed))
+
+def db_stream_started(sql, params=None, itersize=64, cursor_factory=None):
+    """db_stream with the query already run and its first row fetched
+
+    db_stream is lazy, so on its own a bad query or lost connection only
+    surfaces while a 200 response is being sent. Call this inside the view's
+    try so those errors raise there and can still become a 500; the first
+    row is chained back in front of the rest.
+    """
+    rows = db_stream(sql, params, itersize=itersize, cursor_factory=cursor_factory)
+    first = next(rows, None)
+    if first is None:
+        return iter(())
+    return itertools.chain([first], rows)
+
 def parse_and_convert_to_utc(time_str, tz_str):
     """Convert time string to UTC datetime"""
     if not time_str:
@@ -222,30 +374,45 @@ def parse_and_convert_to_utc(time_str, tz_str):
         except (ValueError, IndexError):
             return None
 
-def generate_signed_url(file_path, file_type):
-    """Generate signed URL for file download"""
-    try:
-        from uuid import uuid4
+DOWNLOAD_URL = "/api/v1/files/download"
+
+class SignedUrlSigner:
+    """Signs download URLs for files of one type.
+
+    Create one signer and call sign() for each file, e.g. once per request
+    for a batch of images. The HMAC key schedule is computed once at import
+    and copied per signature instead of being re-derived from the secret.
+    """
+    # HMAC-SHA256 keyed with the server secret, copied for each signature
+    _keyed_hmac = hmac.new(URL_SECRET.encode(), digestmod=hashlib.sha256)
+
+    def __init__(self, file_type):
         from cache_utils import redis_client
+        self.file_type = file_type
+        self._redis = redis_client
 
+    def sign(self, file_path):
+        """Generate a signed URL for file_path, or None if it cannot be stored"""
         file_id = str(uuid4())
         expires = int(time.time()) + URL_EXPIRATION
-        signature_base = f"{file_id}:{file_path}:{expires}"
 
-        # Generate signature
-        signature = hmac.new(
-            URL_SECRET.encode(),
-            signature_base.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        # Must match the signature base verified by the download handler
+        mac = self._keyed_hmac.copy()
+        mac.update(f"{file_id}:{expires}".encode())
+        signature = mac.hexdigest()
 
-        # Store URL info in Redis
+        # Store URL info in Redis. The URL is useless without it, so a Redis
+        # failure is the one error reported as None.
         url_info = {
             'file_path': file_path,
-            'file_type': file_type,
+            'file_type': self.file_type,
             'expires': expires
         }
-        redis_client.setex(f"signed_url:{file_id}", URL_EXPIRATION, json.dumps(url_info))
+        try:
+            self._redis.setex(f"signed_url:{file_id}", URL_EXPIRATION, orjson.dumps(url_info))
+        except redis.RedisError as e:
+            logger.exception(f"Error storing signed URL for {file_path}: {e}")
+            return None
 
         # Generate URL
         params = {
@@ -253,17 +420,16 @@ def generate_signed_url(file_path, file_type):
             'expires': expires,
             'signature': signature
         }
-        url = f"/api/v1/files/download?{urllib.parse.urlencode(params)}"
 
         return {
-            'url': url,
+            'url': f"{DOWNLOAD_URL}?{urllib.parse.urlencode(params)}",
             'expires_at': datetime.fromtimestamp(expires).isoformat(),
             'filename': os.path.basename(file_path)
         }
 
-    except Exception as e:
-        logger.error(f"Error generating signed URL: {e}")
-        return None
+def generate_signed_url(file_path, file_type):
+    """Generate signed URL for file download, or None if it cannot be stored"""
+    return SignedUrlSigner(file_type).sign(file_path)
 
 class CustomJSONEncoder(json.JSONEncoder):
     """Custom JSON encoder to handle Decimal types"""
@@ -271,3 +437,46 @@ class CustomJSONEncoder(json.JSONEncoder):
         if isinstance(obj, Decimal):
             return float(obj)
         return super().default(obj)
+
+def _json_default(obj):
+    """orjson fallback for types it does not serialize natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def json_response(payload):
+    """Serialize payload with orjson and wrap it in a JSON Response.
+
+    orjson encodes datetime, dict and list natively in C, so rows fetched with
+    RealDictCursor can be returned without building per-row dicts or calling
+    isoformat() on each timestamp.
+    """
+    return Response(orjson.dumps(payload, default=_json_default), mimetype='application/json')
+
+def json_stream_response(key, rows, encoded=False):
+    """Stream {key: [row, ...]} as JSON, encoding one row at a time.
+
+    The first bytes go out as soon as the first row is fetched, and only one
+    encoded row is held in memory at a time. With encoded=True each row is a
+    single column of JSON text built by Postgres, which is passed through
+    without being decoded or re-encoded.
+    """
+    def generate():
+        yield b'{"' + key.encode() + b'":['
+        first = True
+        try:
+            for row in rows:
+                if first:
+                    first = False
+                else:
+                    yield b','
+                if encoded:
+                    yield row[0].encode()
+                else:
+                    yield orjson.dumps(row, default=_json_default)
+        except Exception as e:
+            # Headers are already sent; log and close the document
+            logger.error(f"Error streaming {key}: {e}")
+        yield b']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
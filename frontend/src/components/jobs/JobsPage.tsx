@@ -43,6 +43,9 @@ const STATUS_OPTIONS = [
   { value: 'Merging', label: 'Merging' },
 ];
 
+// Jobs fetched per request; a full page means there may be more
+const JOBS_PAGE_SIZE = 100;
+
 // Add debug message state and interface
 interface DebugMessage {
   id: number;
@@ -53,6 +56,8 @@ interface DebugMessage {
 export function JobsPage() {
   const [jobs, setJobs] = useState<Job[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [selectedJob, setSelectedJob] = useState<Job | null>(null);
   const [locations, setLocations] = useState<string[]>([]);
@@ -85,8 +90,9 @@ export function JobsPage() {
       setLoading(true);
       setError(null);
       addDebugMessage('Fetching jobs data...');
-      const response = await apiService.getJobs();
+      const response = await apiService.getJobs({ limit: JOBS_PAGE_SIZE });
       setJobs(response);
+      setHasMore(response.length === JOBS_PAGE_SIZE);
       addDebugMessage(`Successfully fetched ${response.length} jobs`);
     } catch (err: any) {
       console.error('Error loading jobs:', err);
@@ -98,6 +104,27 @@ export function JobsPage() {
     }
   };
 
+  const loadMoreJobs = async () => {
+    if (jobs.length === 0) return;
+    const beforeId = jobs[jobs.length - 1].id;
+    try {
+      setLoadingMore(true);
+      setError(null);
+      addDebugMessage(`Fetching jobs before ${beforeId}...`);
+      const response = await apiService.getJobs({ limit: JOBS_PAGE_SIZE, before_id: beforeId });
+      setJobs(prev => [...prev, ...response]);
+      setHasMore(response.length === JOBS_PAGE_SIZE);
+      addDebugMessage(`Successfully fetched ${response.length} more jobs`);
+    } catch (err: any) {
+      console.error('Error loading more jobs:', err);
+      const errorMessage = err.message || 'Failed to load more jobs';
+      setError(errorMessage);
+      addDebugMessage(`Error loading more jobs: ${errorMessage}`);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadLocations = async () => {
     try {
       const response = await apiService.getSensors();
@@ -436,6 +463,18 @@ export function JobsPage() {
               </Table.Tbody>
             </Table>
           </ScrollArea>
+
+          {hasMore && (
+            <Group justify="center" mt="md">
+              <Button
+                variant="light"
+                onClick={loadMoreJobs}
+                loading={loadingMore}
+              >
+                Load more
+              </Button>
+            </Group>
+          )}
         </Paper>
 
         {/* Job Details Modal */}
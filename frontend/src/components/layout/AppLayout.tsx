@@ -133,7 +133,7 @@ export function AppLayout({ children }: { children: React.ReactNode }) {
               <Avatar 
                 radius="xl" 
                 size="md"
-                src={avatarSeed ? `/api/v1/avatar/${avatarSeed}?username=${username || 'U'}` : undefined}
+                src={avatarSeed ? `/api/v1/avatar/${avatarSeed}/${encodeURIComponent((username || 'U')[0].toUpperCase())}` : undefined}
               >
                 {username ? username[0].toUpperCase() : 'U'}
               </Avatar>
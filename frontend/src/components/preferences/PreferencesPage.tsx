@@ -207,7 +207,7 @@ export function PreferencesPage() {
               <Avatar 
                 size="xl" 
                 radius="xl"
-                src={avatarSeed ? `/api/v1/avatar/${avatarSeed}?username=${username}` : undefined}
+                src={avatarSeed ? `/api/v1/avatar/${avatarSeed}/${encodeURIComponent((username || 'U')[0].toUpperCase())}` : undefined}
               >
                 {username[0]?.toUpperCase() || 'U'}
               </Avatar>
@@ -346,7 +346,9 @@ const apiService = {
   },
 
   // Jobs
-  async getJobs(params?: { username?: string }) {
+  // Jobs come back newest first, one page at a time. Pass the last id of a
+  // page as before_id to fetch the next one.
+  async getJobs(params?: { username?: string; limit?: number; before_id?: number }) {
     debug('Fetching jobs', params);
     const response = await api.get<{ jobs: Job[] }>('/jobs', { params });
     debug(`Fetched ${response.data.jobs.length} jobs`);
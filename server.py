@@ -9,7 +9,7 @@ from datetime import timedelta
 import os
 import threading
 import traceback
-import json
+import orjson
 import hmac
 import hashlib
 import time
@@ -35,15 +35,15 @@ from api.analytics import analytics_bp
 from api.health import health_bp
 from api.logs import logs_bp
 from api.logs_ws import logs_ws_bp, sock
-from api.network import network_bp
+from api.network import network_bp, load_locations
 from api.search import search_bp
 from api.sensors import sensors_bp
 from api.storage import storage_bp
 from api.subnet_mapping import subnet_mapping_bp
 from api.preferences import preferences_bp
 
-# Import network maintenance
-from api.network_tasks import maintenance_thread
+# Import maintenance scheduler
+from api.maintenance import maintenance_scheduler, start_maintenance_thread
 
 # Import Redis client
 from cache_utils import redis_client
@@ -65,18 +65,18 @@ def cleanup_handler(signo=None, frame=None):
         location_manager.cleanup()
         logger.debug("After location_manager.cleanup")
 
-        # Stop network maintenance thread with longer timeout
-        if maintenance_thread and maintenance_thread.is_alive():
+        # Stop maintenance scheduler with longer timeout
+        if maintenance_scheduler and maintenance_scheduler.is_alive():
             try:
-                logger.info("Stopping network maintenance thread...")
-                maintenance_thread.stop()
-                maintenance_thread.join(timeout=5)  # Increased timeout
-                if maintenance_thread.is_alive():
-                    logger.warning("Force terminating maintenance thread")
+                logger.info("Stopping maintenance scheduler...")
+                maintenance_scheduler.stop()
+                maintenance_scheduler.join(timeout=5)  # Increased timeout
+                if maintenance_scheduler.is_alive():
+                    logger.warning("Force terminating maintenance scheduler")
                     # Force thread termination if needed
-                    maintenance_thread._stop()
+                    maintenance_scheduler._stop()
             except Exception as e:
-                logger.error(f"Error stopping network maintenance thread: {e}")
+                logger.error(f"Error stopping maintenance scheduler: {e}")
 
         # Close database connections
         try:
@@ -133,7 +133,7 @@ def check_if_token_in_blocklist(jwt_header, jwt_payload):
     """Check if token is in blacklist"""
     jti = jwt_payload['jti']
     token_in_redis = redis_client.get(f'revoked_token:{jti}')
-    logger.debug(f"Checking token {jti} in blocklist: {'blocked' if token_in_redis else 'allowed'}")
+    logger.debug("Checking token", jti, "in blocklist:", 'blocked' if token_in_redis else 'allowed')
     return token_in_redis is not None
 
 # Register error handler for revoked tokens
@@ -198,19 +198,21 @@ def download_file():
         if not url_info:
             return jsonify({"error": "Download URL not found"}), 404
 
-        url_info = json.loads(url_info)
+        url_info = orjson.loads(url_info)
         file_path = url_info['file_path']
 
-        if not os.path.exists(file_path):
+        # send_file stats the file itself; a missing file surfaces here
+        # without a separate exists() probe
+        try:
+            return send_file(
+                file_path,
+                mimetype=url_info['file_type'],
+                as_attachment=True,
+                download_name=os.path.basename(file_path)
+            )
+        except FileNotFoundError:
             return jsonify({"error": "File not found"}), 404
 
-        return send_file(
-            file_path,
-            mimetype=url_info['file_type'],
-            as_attachment=True,
-            download_name=os.path.basename(file_path)
-        )
-
     except Exception as e:
         logger.error(f"File download error: {e}")
         return jsonify({"error": "Failed to download file"}), 500
@@ -294,9 +296,14 @@ def after_request(response):
 
 if __name__ == '__main__':
     try:
-        # Start maintenance thread
-        maintenance_thread.start()
-        logger.info("Network maintenance thread started")
+        # Start maintenance scheduler
+        start_maintenance_thread()
+
+        # Locations are reference data; load them before serving
+        try:
+            load_locations()
+        except Exception as e:
+            logger.warning(f"Locations not preloaded, will load on first request: {e}")
 
         # Configure SSL context
         ssl_context = None
@@ -57,6 +57,7 @@ class SimpleLogger:
         'max_size_mb': 1024,                # Default max file size in MB
         'backup_count': 3,                  # Default number of backup files
         'console_output': False,            # Default console output setting
+        'log_level': 'DEBUG',               # Default minimum level to emit
         'dir_perms': 0o770,                 # Default dir permissions (rwxrwx---)
         'file_perms': 0o640                 # Default file permissions (rw-r-----)
     }
@@ -101,6 +102,7 @@ class SimpleLogger:
                     'max_size_mb': logging_config.getint('max_size', config['max_size_mb']) // (1024 * 1024),  # Convert bytes to MB
                     'backup_count': logging_config.getint('backup_count', config['backup_count']),
                     'console_output': logging_config.getboolean('console_output', config['console_output']),
+                    'log_level': logging_config.get('log_level', config['log_level']),
                     'dir_perms': int(logging_config.get('dir_perms', '0o770'), 8),
                     'file_perms': int(logging_config.get('file_perms', '0o640'), 8)
                 })
@@ -118,7 +120,8 @@ class SimpleLogger:
         backup_count: Optional[int] = None,
         console_output: Optional[bool] = None,
         dir_perms: Optional[int] = None,
-        file_perms: Optional[int] = None
+        file_perms: Optional[int] = None,
+        log_level: Optional[str] = None
     ):
         """
         Initialize the logger with given or default parameters.
@@ -132,6 +135,7 @@ class SimpleLogger:
             console_output: Whether to output to console (optional)
             dir_perms: Directory permissions in octal (optional)
             file_perms: File permissions in octal (optional)
+            log_level: Minimum level name to emit, e.g. 'INFO' (optional)
         """
         # Use provided app_name or default from DEFAULT_CONFIG
         self.app_name = app_name if app_name is not None else self.DEFAULT_CONFIG['app_name']
@@ -147,6 +151,8 @@ class SimpleLogger:
         self.console_output = console_output if console_output is not None else config['console_output']
         self.dir_perms = dir_perms if dir_perms is not None else config['dir_perms']
         self.file_perms = file_perms if file_perms is not None else config['file_perms']
+        level_name = log_level if log_level is not None else config['log_level']
+        self.log_level = getattr(logging, str(level_name).upper(), logging.DEBUG)
 
         self.logger: Optional[logging.Logger] = None
 
@@ -159,7 +165,7 @@ class SimpleLogger:
 
             # Initialize the logger
             self.logger = logging.getLogger(log_name)  # Use log_name directly for cleaner output
-            self.logger.setLevel(logging.DEBUG)  # Capture all log levels
+            self.logger.setLevel(self.log_level)  # Honor configured minimum level
 
             # Add our caller path filter to correct the caller information
             self.logger.addFilter(CallerPathFilter())
@@ -220,7 +226,7 @@ class SimpleLogger:
             # Fall back to basic console logger if everything else fails
             print(f"Warning: Failed to initialize logger: {str(e)}", file=sys.stderr)
             self.logger = logging.getLogger(log_name)  # Use log_name for consistency
-            self.logger.setLevel(logging.DEBUG)
+            self.logger.setLevel(self.log_level)
 
             # Basic console handler with same format
             console_handler = logging.StreamHandler(sys.stdout)
@@ -228,8 +234,18 @@ class SimpleLogger:
             console_handler.setFormatter(basic_formatter)
             self.logger.addHandler(console_handler)
 
+    def isEnabledFor(self, level: int) -> bool:
+        """Return True if a message at this level would be emitted.
+
+        Use this to guard debug output whose arguments are expensive to build,
+        since f-strings are evaluated before the logging call is made.
+        """
+        return self.logger.isEnabledFor(level)
+
     def _log(self, level: int, *messages: Union[str, Exception, dict, list, tuple, set, int, float, bool]) -> None:
         """Internal method to safely handle all logging."""
+        if not self.logger.isEnabledFor(level):
+            return
         try:
             # Convert each message to string and join them
             formatted_messages = [
@@ -286,7 +302,13 @@ class SimpleLogger:
         self._log(logging.CRITICAL, *messages)
 
     def exception(self, *messages: Union[str, Exception, dict, list, tuple, set, int, float, bool]) -> None:
-        """Log exception messages with traceback."""
+        """Log exception messages with traceback.
+
+        Call from an except block. The traceback is only formatted by the
+        handlers, so nothing is built when ERROR output is disabled.
+        """
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
         try:
             final_message = " ".join(str(msg) for msg in messages)
             self.logger.exception(final_message)
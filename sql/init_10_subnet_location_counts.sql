@@ -0,0 +1,20 @@
+-- Subnet mapping counts per location pair, served by /api/v1/subnet-location-counts
+-- Locations are lowercased here so the endpoint filters with plain equality on the unique index
+-- instead of aggregating subnet_location_map and applying LOWER() on every request.
+-- Created WITH DATA so REFRESH ... CONCURRENTLY can be used from the start.
+CREATE MATERIALIZED VIEW IF NOT EXISTS subnet_location_counts AS
+SELECT
+    lower(src_location) AS src_location,
+    lower(dst_location) AS dst_location,
+    COUNT(*) AS count
+FROM subnet_location_map
+GROUP BY 1, 2;
+ALTER MATERIALIZED VIEW subnet_location_counts OWNER TO pcapuser;
+
+-- Required for REFRESH MATERIALIZED VIEW CONCURRENTLY, and serves src/dst lookups
+CREATE UNIQUE INDEX IF NOT EXISTS idx_subnet_location_counts_unique
+    ON subnet_location_counts(src_location, dst_location);
+
+-- Serves dst-only lookups
+CREATE INDEX IF NOT EXISTS idx_subnet_location_counts_dst
+    ON subnet_location_counts(dst_location);
@@ -0,0 +1,12 @@
+-- Keyset pagination of a location's jobs
+-- Built CONCURRENTLY so this file can also be applied to a live database without blocking writes.
+
+-- Per-location job listing: WHERE location = %s [AND id < %s] ORDER BY id DESC LIMIT %s
+-- Each page is a bounded index range scan, however deep the client has paged.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_location_id
+    ON public.jobs(location, id DESC);
+
+-- Verify with:
+--   EXPLAIN (ANALYZE, BUFFERS)
+--   SELECT id FROM jobs WHERE location = 'KSC' AND id < 1000 ORDER BY id DESC LIMIT 250;
+-- The plan should show an Index Scan using idx_jobs_location_id with no Sort node.
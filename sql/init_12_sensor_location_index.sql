@@ -0,0 +1,8 @@
+-- Sensor lookups by location
+-- Built CONCURRENTLY so this file can also be applied to a live database without blocking writes.
+
+-- Every job submission and job processor start looks up a location's sensors:
+--   WHERE location = %s AND status != 'Offline'
+-- sensors is keyed by name only, so without this each lookup is a full scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sensors_location
+    ON public.sensors(location);
@@ -0,0 +1,23 @@
+-- Indexes supporting the jobs listing and active-job lookups
+-- Built CONCURRENTLY so this file can also be applied to a live database without blocking writes.
+-- psql runs each statement in autocommit mode, which CONCURRENTLY requires.
+
+-- Per-user job listing: WHERE submitted_by = %s ORDER BY id DESC
+-- Lets get_all_jobs walk the index in order instead of sorting.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_submitted_by_id
+    ON public.jobs(submitted_by, id DESC);
+
+-- Active jobs only: the statuses that can still be cancelled or picked up.
+-- Partial so finished jobs (the bulk of the table) are never indexed.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_active_status_id
+    ON public.jobs(status, id DESC)
+    WHERE status IN ('Submitted', 'Running');
+
+-- Time window filters on the PCAP search boundaries
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_start_end
+    ON public.jobs(start_time, end_time);
+
+-- Verify with:
+--   EXPLAIN (ANALYZE, BUFFERS)
+--   SELECT id FROM jobs WHERE submitted_by = 'user' ORDER BY id DESC LIMIT 250;
+-- The plan should show an Index Scan using idx_jobs_submitted_by_id with no Sort node.
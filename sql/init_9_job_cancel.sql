@@ -0,0 +1,4 @@
+-- Allow jobs to be cancelled by their owner
+-- STATUS.Cancelled in config.ini maps to this value; the original job_status enum did not include it.
+-- ADD VALUE cannot run inside a transaction block; psql runs it in autocommit mode.
+ALTER TYPE public.job_status ADD VALUE IF NOT EXISTS 'Cancelled';
@@ -109,6 +109,24 @@ class JobFetchTest(BaseTest):
             "Task data mismatch or not found" if not success else None
         ))
     
+    def test_03_get_all_jobs_db_error(self):
+        """Test that a database error listing jobs is a 500, not an empty 200"""
+        # Postgres rejects NUL bytes in string parameters, so the query fails
+        result = self.request(
+            "GET",
+            "/api/v1/jobs?username=%00",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=500
+        )
+
+        self.add_result(TestResult(
+            "Get all jobs database error",
+            result['success'] and 'error' in (result['response'] or {}),
+            result.get('response'),
+            result.get('error')
+        ))
+
     def teardown(self):
         """Cleanup after job fetch tests"""
         if hasattr(self, 'access_token'):
@@ -4,6 +4,14 @@ Tests the job submission and management endpoints
 """
 from .base import BaseTest, TestResult
 from datetime import datetime, timedelta
+import os
+import time
+
+# Fixture job submitted by test_admin and already Complete
+OTHER_USERS_JOB_ID = 5
+
+# Task statuses a cancelled job must no longer have
+ACTIVE_TASK_STATUSES = ('Submitted', 'Running', 'Retrieving')
 
 class JobTest(BaseTest):
     """Test suite for job endpoints"""
@@ -11,6 +19,7 @@ class JobTest(BaseTest):
     def __init__(self, base_url: str):
         super().__init__(base_url)
         self.access_token = None
+        self.cancelled_status = self.config.get('STATUS', 'Cancelled')
     
     def setup(self):
         """Setup required for job tests - login first"""
@@ -28,6 +37,30 @@ class JobTest(BaseTest):
             raise Exception("Failed to login for job tests")
             
         self.access_token = result['response']['access_token']
+
+    def _find_submitted_job(self, timeout: float = 10):
+        """Find the job submitted in test_02 in the all-jobs listing.
+
+        The job process creates the job record after the submit returns, so
+        the listing is polled until it shows up.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.request(
+                "GET",
+                f"/api/v1/jobs?username={self.auth_username}&limit=20",
+                auth=True,
+                auth_token=self.access_token
+            )
+            if result['success']:
+                for job in result['response'].get('jobs', []):
+                    if (job.get('src_ip') == self.job_params.get('src_ip') and
+                        job.get('dst_ip') == self.job_params.get('dst_ip') and
+                        job.get('description') == self.job_params.get('description')):
+                        return job
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.5)
     
     def test_01_get_sensors(self):
         """Get list of sensors to find an online one for job submission"""
@@ -231,6 +264,226 @@ class JobTest(BaseTest):
             result.get('error')
         ))
     
+    def test_06_delete_missing_job(self):
+        """Test deleting a job that does not exist"""
+        result = self.request(
+            "DELETE",
+            "/api/v1/jobs/999999999",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=404
+        )
+
+        self.add_result(TestResult(
+            "Delete missing job",
+            result['success'],
+            result['response'],
+            result.get('error')
+        ))
+    
+    def test_07_jobs_by_location_db_error(self):
+        """Test that a database error listing a location's jobs is a 500"""
+        # Postgres rejects NUL bytes in string parameters, so the query fails
+        result = self.request(
+            "GET",
+            "/api/v1/jobs/bad%00location",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=500
+        )
+
+        self.add_result(TestResult(
+            "Get jobs by location database error",
+            result['success'] and 'error' in (result['response'] or {}),
+            result.get('response'),
+            result.get('error')
+        ))
+
+    def test_08_cancel_own_job(self):
+        """Test cancelling the submitted job as its owner"""
+        if not hasattr(self, 'job_params'):
+            self.add_result(TestResult(
+                "Cancel own job",
+                False,
+                None,
+                "No job parameters available (previous test failed)"
+            ))
+            return
+
+        job = self._find_submitted_job()
+        if not job:
+            self.add_result(TestResult(
+                "Cancel own job",
+                False,
+                None,
+                "Submitted job not found"
+            ))
+            return
+        self.job_id = job['id']
+
+        result = self.request(
+            "POST",
+            f"/api/v1/jobs/{self.job_id}/cancel",
+            auth=True,
+            auth_token=self.access_token
+        )
+
+        # The job is cancelled and none of its tasks are left running
+        success = False
+        error = result.get('error')
+        if result['success']:
+            job = self._find_submitted_job(timeout=0)
+            statuses = [t['status'] for t in (job or {}).get('tasks', [])]
+            success = (job is not None and
+                       job['status'] == self.cancelled_status and
+                       not any(s in ACTIVE_TASK_STATUSES for s in statuses))
+            if not success:
+                error = f"Job status {job and job['status']}, task statuses {statuses}"
+
+        self.add_result(TestResult(
+            "Cancel own job",
+            success,
+            result['response'],
+            error
+        ))
+
+    def test_09_cancel_other_users_job(self):
+        """Test that a user cannot cancel another user's job"""
+        result = self.request(
+            "POST",
+            f"/api/v1/jobs/{OTHER_USERS_JOB_ID}/cancel",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=403
+        )
+
+        self.add_result(TestResult(
+            "Cancel another user's job",
+            result['success'],
+            result['response'],
+            result.get('error')
+        ))
+
+    def test_10_cancel_finished_job(self):
+        """Test that a job that is no longer active cannot be cancelled"""
+        if not hasattr(self, 'job_id'):
+            self.add_result(TestResult(
+                "Cancel finished job",
+                False,
+                None,
+                "No cancelled job available (previous test failed)"
+            ))
+            return
+
+        # The job was cancelled by test_08
+        result = self.request(
+            "POST",
+            f"/api/v1/jobs/{self.job_id}/cancel",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=400
+        )
+
+        self.add_result(TestResult(
+            "Cancel finished job",
+            result['success'],
+            result['response'],
+            result.get('error')
+        ))
+
+    def test_11_delete_other_users_job(self):
+        """Test that a user cannot delete another user's job"""
+        result = self.request(
+            "DELETE",
+            f"/api/v1/jobs/{OTHER_USERS_JOB_ID}",
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=403
+        )
+
+        self.add_result(TestResult(
+            "Delete another user's job",
+            result['success'],
+            result['response'],
+            result.get('error')
+        ))
+
+    def test_12_delete_own_job(self):
+        """Test deleting the cancelled job removes its rows and result files"""
+        job = self._find_submitted_job(timeout=0) if hasattr(self, 'job_id') else None
+        if not job:
+            self.add_result(TestResult(
+                "Delete own job",
+                False,
+                None,
+                "No cancelled job available (previous test failed)"
+            ))
+            return
+
+        # Files the delete must remove. Only checked when the server shares
+        # this filesystem, i.e. when they exist here before the delete.
+        paths = [t['temp_path'] for t in job.get('tasks', []) if t.get('temp_path')]
+        if job.get('result_path'):
+            paths.append(job['result_path'])
+        local_paths = [p for p in paths if os.path.exists(p)]
+
+        result = self.request(
+            "DELETE",
+            f"/api/v1/jobs/{self.job_id}",
+            auth=True,
+            auth_token=self.access_token
+        )
+
+        success = False
+        error = result.get('error')
+        if result['success']:
+            # The job and its tasks are gone from the database
+            status = self.request(
+                "GET",
+                f"/api/v1/jobs/{self.job_id}/status",
+                auth=True,
+                auth_token=self.access_token,
+                expected_status=404
+            )
+            gone = status['success'] and self._find_submitted_job(timeout=0) is None
+
+            # Files are removed by a background thread, so allow it a moment
+            deadline = time.monotonic() + 5
+            while any(os.path.exists(p) for p in local_paths) and time.monotonic() < deadline:
+                time.sleep(0.2)
+            left = [p for p in local_paths if os.path.exists(p)]
+
+            success = gone and not left
+            if not gone:
+                error = "Job still present after delete"
+            elif left:
+                error = f"Files not removed: {left}"
+
+        self.add_result(TestResult(
+            "Delete own job",
+            success,
+            result['response'],
+            error
+        ))
+
+    def test_13_submit_job_empty_params(self):
+        """Test that an empty params object is rejected as missing"""
+        result = self.request(
+            "POST",
+            "/api/v1/jobs/submit",
+            data={"location": "KSC", "params": {}},
+            auth=True,
+            auth_token=self.access_token,
+            expected_status=400
+        )
+
+        self.add_result(TestResult(
+            "Submit job with empty params",
+            result['success'] and (result['response'] or {}).get('errors') == ['missing:params'],
+            result['response'],
+            result.get('error')
+        ))
+
     def teardown(self):
         """Cleanup after job tests"""
         if hasattr(self, 'access_token'):
@@ -68,6 +68,18 @@ sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_6_network_mapping.sql|ca
 error_check "schema import"
 sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_7_user_preferences.sql|cat
 error_check "schema import"  
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_8_job_indexes.sql|cat
+error_check "schema import"
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_9_job_cancel.sql|cat
+error_check "schema import"
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_10_subnet_location_counts.sql|cat
+error_check "schema import"
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_11_job_location_index.sql|cat
+error_check "schema import"
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_12_sensor_location_index.sql|cat
+error_check "schema import"
+sudo -u postgres psql pcapdb < /opt/pcapserver/sql/init_13_task_job_status_index.sql|cat
+error_check "schema import"
 echo -e "${NC}"
 
 echo -e "${BLUE}[ COMPLETE ]${NC}"